@@ -0,0 +1,136 @@
+from ..utils.email_parser import parse_email_file
+from ..features.rules import basic_rules
+from ..features.text import text_stats
+from ..services.router import analyze_batch as route_batch
+from ..services.latency import LATENCY
+from .ensemble import compute_risk, cascade_decision
+import os
+import time
+import threading
+import concurrent.futures
+
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+PARSE_PROCESSES = int(os.environ.get("BATCH_PARSE_PROCESSES", "0"))
+LLM_BATCH = os.environ.get("LLM_BATCH_MODE", "0") == "1"
+
+_PROC_POOL = None
+_PROC_LOCK = threading.Lock()
+
+
+def _stages(path):
+    """CPU 阶段：解析邮件并计算规则与文本特征，同时返回各阶段耗时（可在子进程中执行）"""
+    t0 = time.perf_counter()
+    parsed = parse_email_file(path)
+    t1 = time.perf_counter()
+    r = basic_rules(parsed)
+    t2 = time.perf_counter()
+    t = text_stats(parsed.get("text"))
+    t3 = time.perf_counter()
+    timings = {"parse_email_file": t1 - t0, "basic_rules": t2 - t1, "text_stats": t3 - t2}
+    return (parsed, r, t), timings
+
+
+def prepare(path):
+    prepared, timings = _stages(path)
+    LATENCY.record_many(timings)
+    return prepared
+
+
+def _process_pool():
+    global _PROC_POOL
+    if PARSE_PROCESSES <= 0:
+        return None
+    with _PROC_LOCK:
+        if _PROC_POOL is None:
+            _PROC_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=PARSE_PROCESSES)
+        return _PROC_POOL
+
+
+def prepare_async(path):
+    pool = _process_pool()
+    if pool is None:
+        return None
+    # 子进程中的计时无法直接写入本进程的直方图，随结果带回后在此记录
+    outer = concurrent.futures.Future()
+
+    def _done(fut):
+        try:
+            prepared, timings = fut.result()
+        except BaseException as e:
+            outer.set_exception(e)
+            return
+        LATENCY.record_many(timings)
+        outer.set_result(prepared)
+
+    pool.submit(_stages, path).add_done_callback(_done)
+    return outer
+
+
+def analyze_one(path, model="gemini", prepared=None, reuse=None, llm=None, config=None):
+    """
+    reuse(parsed) 可返回已缓存的 LLM 特征，命中时跳过 LLM 调用；
+    config 为本次请求的提供方配置（ProviderConfig）。
+    """
+    with LATENCY.timer("pipeline"):
+        if prepared is None:
+            fut = prepare_async(path)
+            prepared = fut.result() if fut is not None else prepare(path)
+        parsed, r, t = prepared
+        if llm is None and reuse:
+            llm = reuse(parsed)
+        return parsed, compute_risk(parsed, model, rules=r, stats=t, llm=llm, config=config)
+
+
+def _batch_llm(prepared, model, reuse, config=None):
+    """对未命中复用的邮件统一走 LLM 打包分析，失败项留空由单封流程处理"""
+    llms = [None] * len(prepared)
+    todo = []
+    for i, pre in enumerate(prepared):
+        if isinstance(pre, Exception):
+            continue
+        llms[i] = reuse(pre[0]) if reuse else None
+        if llms[i] is None and cascade_decision(*pre)[0] is None:
+            todo.append(i)
+    if len(todo) < 2:
+        return llms
+    t0 = time.perf_counter()
+    try:
+        # 经路由发送，熔断中的提供方不再收到打包请求；调用指标在 run_batch 中按邮件计数
+        out = route_batch([prepared[i][0].get("text") for i in todo], model, config)
+    finally:
+        LATENCY.record("llm_batch", time.perf_counter() - t0, provider=model)
+    for i, res in zip(todo, out):
+        if not isinstance(res, Exception):
+            llms[i] = res
+    return llms
+
+
+def analyze_batch(paths, model="gemini", concurrency=None, reuse=None, llm_batch=None, config=None):
+    """并发分析一批文件，结果顺序与输入一致；单个文件失败时对应位置为异常对象"""
+    limit = max(1, min(int(concurrency or BATCH_CONCURRENCY), len(paths) or 1))
+    prepared = [prepare_async(p) for p in paths]
+    llms = [None] * len(paths)
+
+    if LLM_BATCH if llm_batch is None else llm_batch:
+        resolved = []
+        for p, fut in zip(paths, prepared):
+            try:
+                resolved.append(fut.result() if fut is not None else prepare(p))
+            except Exception as e:
+                resolved.append(e)
+        prepared = resolved
+        llms = _batch_llm(prepared, model, reuse, config)
+
+    def _run(i):
+        try:
+            pre = prepared[i]
+            if isinstance(pre, Exception):
+                raise pre
+            if isinstance(pre, concurrent.futures.Future):
+                pre = pre.result()
+            return analyze_one(paths[i], model, prepared=pre, reuse=reuse, llm=llms[i], config=config)
+        except Exception as e:
+            return e
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=limit) as ex:
+        return list(ex.map(_run, range(len(paths))))
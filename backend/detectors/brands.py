@@ -0,0 +1,156 @@
+from ..utils.domain import _vec, cosine
+import os
+import json
+import time
+import heapq
+import threading
+
+BRANDS_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "brands.json")
+# 两次检查 brands.json 修改时间的最小间隔（秒）
+CHECK_INTERVAL = float(os.environ.get("BRANDS_CHECK_INTERVAL", "2"))
+# 倒排检索后参与精确余弦重打分的候选数
+TOP_K = int(os.environ.get("BRANDS_TOP_K", "64"))
+# 出现在过多官方域中的三元组（如 "com"）不参与候选检索
+STOP_MIN = int(os.environ.get("BRANDS_STOP_MIN", "500"))
+STOP_RATIO = float(os.environ.get("BRANDS_STOP_RATIO", "0.02"))
+
+
+class CompiledBrands:
+    """一次构建的不可变品牌索引：三元组倒排表 + 品牌名前缀表"""
+
+    def __init__(self, data):
+        self.names = []
+        self.domains = []
+        self.brand_domains = []
+        self.postings = {}
+        self.heads = {}
+        self.short = []
+        for b in data:
+            name = b.get("name") or ""
+            low = name.lower()
+            bi = len(self.names)
+            self.names.append((name, low))
+            ids = []
+            for bd in b.get("domains") or []:
+                di = len(self.domains)
+                bvec = _vec(bd)
+                self.domains.append((bi, bd, bvec))
+                ids.append(di)
+                for g, w in bvec.items():
+                    self.postings.setdefault(g, []).append((di, w))
+            self.brand_domains.append(ids)
+            # 名称按前三个字符分桶，短名称单独做子串判断
+            if len(low) >= 3:
+                self.heads.setdefault(low[:3], []).append(bi)
+            else:
+                self.short.append(bi)
+        self.stop_df = max(STOP_MIN, int(STOP_RATIO * len(self.domains)))
+        self.no_domain = self._best(None, None, range(len(self.domains)), set())
+
+    def named(self, *texts):
+        """返回在任一文本中出现名称的品牌下标"""
+        found = set()
+        for s in texts:
+            if not s:
+                continue
+            for i in range(len(s) - 2):
+                for bi in self.heads.get(s[i : i + 3], ()):
+                    if bi not in found and s.startswith(self.names[bi][1], i):
+                        found.add(bi)
+            for bi in self.short:
+                if self.names[bi][1] in s:
+                    found.add(bi)
+        return found
+
+    def candidates(self, dvec, k=TOP_K):
+        acc = {}
+        for g, w in dvec.items():
+            post = self.postings.get(g)
+            if not post or len(post) > self.stop_df:
+                continue
+            for di, bw in post:
+                acc[di] = acc.get(di, 0.0) + w * bw
+        if len(acc) <= k:
+            return list(acc)
+        return heapq.nlargest(k, acc, key=acc.get)
+
+    def _best(self, dom, dvec, ids, named):
+        brand_hit = None
+        brand_dom_hit = None
+        score_sim = 0.0
+        # 按原始顺序比较，保证并列时与逐个扫描的结果一致
+        for di in sorted(ids):
+            bi, bd, bvec = self.domains[di]
+            s = cosine(dvec if dom else bvec, bvec)
+            if s > score_sim and (bi in named or s >= 0.6):
+                score_sim = s
+                brand_hit = self.names[bi][0]
+                brand_dom_hit = bd
+        return brand_hit, brand_dom_hit, score_sim
+
+    def match(self, dom, text_all):
+        if not dom:
+            # 无候选域时每个官方域与自身比较，结果与正文无关，构建时已算好
+            return self.no_domain
+        dvec = _vec(dom)
+        named = self.named(text_all.lower(), dom.lower())
+        ids = set(self.candidates(dvec))
+        for bi in named:
+            ids.update(self.brand_domains[bi])
+        return self._best(dom, dvec, ids, named)
+
+
+class BrandIndex:
+    """
+    品牌库只在启动时与文件修改后解析一次，
+    预先计算小写名称与各官方域的三元组向量。
+    """
+
+    def __init__(self, path=BRANDS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = 0.0
+        self.compiled = CompiledBrands([])
+        self.reloads = 0
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked < CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime == self._mtime and not force:
+                return
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    compiled = CompiledBrands(json.load(f))
+            except Exception:
+                # 文件损坏或缺失：首次加载时为空，之后保留上一版本
+                compiled = self.compiled
+            self.compiled = compiled
+            self._mtime = mtime
+            self.reloads += 1
+
+    def match(self, dom, text_all):
+        """返回 (品牌名, 命中的官方域, 相似度)；无命中时品牌名为 None"""
+        self.refresh()
+        return self.compiled.match(dom, text_all)
+
+    def stats(self):
+        c = self.compiled
+        return {
+            "brands": len(c.names),
+            "domains": len(c.domains),
+            "trigrams": len(c.postings),
+            "stop_df": c.stop_df,
+            "reloads": self.reloads,
+        }
+
+
+BRANDS = BrandIndex()
@@ -1,118 +1,80 @@
 from ..features.rules import basic_rules
 from ..features.text import text_stats
-from ..services.gemini_llm import analyze_text as gemini_analyze
-from ..services.glm_llm import analyze_text as glm_analyze
-from ..services.custom_llm import analyze_text as custom_analyze
+from ..services.router import analyze as route_analyze, BreakerOpen
 from ..services.advice import get_advice
-from ..utils.domain import extract_domain, visual_similarity, embedding_similarity, normalize_homoglyph
-from ..utils.whois_ct_ssl import get_whois, get_ssl_cert, get_ct_logs
+from ..utils.domain import visual_similarity, normalize_homoglyph, registered_domain, unique_domains
+from .stages import start_enrichment, collect_enrichment
+from .brands import BRANDS
 import os
-import json
+import time
+import bisect
+
+# 级联：先执行规则/文本/邮件头等廉价阶段，仅当部分得分处于不确定区间时调用 LLM
+CASCADE = os.environ.get("CASCADE_ENABLED", "1") == "1"
+CASCADE_LOW = float(os.environ.get("CASCADE_LOW", "10"))
+CASCADE_HIGH = float(os.environ.get("CASCADE_HIGH", "85"))
+CASCADE_ATTACHMENT = int(os.environ.get("CASCADE_ATTACHMENT", "40"))
+CASCADE_KEYWORD = int(os.environ.get("CASCADE_KEYWORD", "30"))
+# 规则明确恶意而跳过 LLM 时的得分下限，默认为“高”等级的下界，不会把判定抬到危急
+CASCADE_FLOOR = float(os.environ.get("CASCADE_FLOOR", "60"))
+# 单封邮件最多分析的注册域数量与情报查询的总时间预算（秒）
+DOMAIN_MAX = int(os.environ.get("DOMAIN_MAX", "8"))
+DOMAIN_BUDGET = float(os.environ.get("DOMAIN_BUDGET", "15"))
+
+# 风险等级与威胁严重度共用同一组阈值：[0,30) 低、[30,60) 中、[60,85) 高、[85,∞) 危急
+LEVELS = ("低", "中", "高", "危急")
+LEVEL_BOUNDS = (30, 60, 85)
 
 def level_from_score(score):
-    if score < 30:
-        return "低"
-    if score < 60:
-        return "中"
-    if score < 85:
-        return "高"
-    return "危急"
+    return LEVELS[bisect.bisect_right(LEVEL_BOUNDS, score)]
 
-def compute_risk(parsed, model: str = "gemini"):
-    r = basic_rules(parsed)
-    t = text_stats(parsed.get("text"))
-    if model == "glm46":
-        llm = glm_analyze(parsed.get("text"))
-    elif model == "custom":
-        llm = custom_analyze(parsed.get("text"))
-    else:
-        llm = gemini_analyze(parsed.get("text"))
-    score = min(100, int(
+def header_auth(parsed):
+    headers = parsed.get("meta", {}).get("headers", {}) or {}
+    auth = headers.get("Authentication-Results") or ""
+    spf = headers.get("Received-SPF") or ""
+    dkim = headers.get("DKIM-Signature") or ""
+    failed = "fail" in auth.lower()
+    return {
+        "from": headers.get("From") or "",
+        "auth": auth,
+        "spf": spf,
+        "dkim": dkim,
+        "failed": failed,
+        "suspicious": (not auth) or failed or (not dkim),
+    }
+
+def rule_score(r, t):
+    return (
         0.45 * r["keyword"] +
         0.25 * r["url"] +
         0.15 * r["attachment"] +
         0.15 * t["perplexity"] +
-        0.10 * t["burstiness"] +
-        0.20 * llm.get("style_anomaly", 0) +
-        0.20 * llm.get("social_engineering", 0) +
-        0.15 * llm.get("llm_generated_probability", 0)
-    ))
-    level = level_from_score(score)
-    confidence = 0.5 + (score / 200.0)
-    summary = "关键词:{} URL:{} 附件:{} 文本困惑度:{} 突发度:{}".format(r["keyword"], r["url"], r["attachment"], round(t["perplexity"],2), round(t["burstiness"],2))
-    summary += " LLM风格异常:{} 社工评分:{} 生成概率:{}".format(llm.get("style_anomaly",0), llm.get("social_engineering",0), llm.get("llm_generated_probability",0))
-    threats = []
-    def sev(v):
-        return "危急" if v >= 85 else ("高" if v >= 60 else ("中" if v >= 30 else "低"))
-    if r["keyword"] >= 30 or llm.get("social_engineering",0) >= 30:
-        threats.append({
-            "name": "社会工程诱导",
-            "severity": sev(max(r["keyword"], llm.get("social_engineering",0))),
-            "vector": "钓鱼话术与敏感信息索取",
-            "affected": ["邮箱收件人","账户登录接口"],
-            "impact": "凭据泄露与账户接管",
-            "sample": (parsed.get("text") or "")[:200],
-            "recommendation": get_advice("社会工程诱导")
-        })
-    if r["url"] > 0:
-        url = (parsed.get("urls") or [""])[0]
-        threats.append({
-            "name": "恶意链接",
-            "severity": sev(max(r["url"], llm.get("semantic_consistency",0))),
-            "vector": "链接重定向与仿冒站点",
-            "affected": ["浏览器","登录表单"],
-            "impact": "会话劫持与凭据收集",
-            "sample": url,
-            "recommendation": get_advice("恶意链接")
-        })
-        dom = extract_domain(url)
-    else:
-        dom = ""
-    if r["attachment"] > 0:
-        att = (parsed.get("attachments") or [""])[0]
-        threats.append({
-            "name": "危险附件",
-            "severity": sev(r["attachment"]),
-            "vector": "可执行或宏文档",
-            "affected": ["终端系统","办公组件"],
-            "impact": "代码执行与持久化",
-            "sample": att,
-            "recommendation": get_advice("危险附件")
-        })
-    if llm.get("style_anomaly",0) >= 40 or llm.get("llm_generated_probability",0) >= 40:
-        threats.append({
-            "name": "生成文本伪装",
-            "severity": sev(max(llm.get("style_anomaly",0), llm.get("llm_generated_probability",0))),
-            "vector": "风格异常与模板化表述",
-            "affected": ["人机信任","审阅流程"],
-            "impact": "提高欺骗成功率",
-            "sample": summary,
-            "recommendation": get_advice("生成文本伪装")
-        })
+        0.10 * t["burstiness"]
+    )
 
-    bpath = os.path.join(os.path.dirname(__file__), "..", "data", "brands.json")
-    try:
-        brands_data = json.load(open(bpath, "r", encoding="utf-8"))
-    except Exception:
-        brands_data = []
-    text_all = (parsed.get("text") or "") + " " + (parsed.get("meta",{}).get("subject") or "")
-    brand_hit = None
-    brand_dom_hit = None
-    score_sim = 0.0
-    for b in brands_data:
-        name = b.get("name") or ""
-        domains = b.get("domains") or []
-        cond = (name.lower() in text_all.lower()) or (dom and name.lower() in dom.lower())
-        for bd in domains:
-            s = embedding_similarity(dom or bd, bd)
-            if s > score_sim and (cond or s >= 0.6):
-                score_sim = s
-                brand_hit = name
-                brand_dom_hit = bd
+def cascade_decision(parsed, r, t, auth=None):
+    """返回 (决策, 部分得分)；决策为 None 表示需要调用 LLM"""
+    partial = rule_score(r, t)
+    if not CASCADE:
+        return None, partial
+    auth = auth or header_auth(parsed)
+    if partial >= CASCADE_HIGH:
+        return "rules_malicious", partial
+    if r["attachment"] >= CASCADE_ATTACHMENT and r["keyword"] >= CASCADE_KEYWORD:
+        return "rules_malicious", partial
+    if partial < CASCADE_LOW and not parsed.get("urls") and not parsed.get("attachments") and not auth["failed"]:
+        return "rules_benign", partial
+    return None, partial
+
+def _domain_threats(dom, enrich, text_all, sev):
+    """单个域名的品牌冒充与同形异义检测，返回 (威胁列表, 域名结果摘要)"""
+    threats = []
+    brand_hit, brand_dom_hit, score_sim = BRANDS.match(dom, text_all)
+    sim = 0.0
     if brand_hit:
-        w = get_whois(dom) if dom else {"ok": False}
-        c = get_ssl_cert(dom) if dom else {"ok": False}
-        ct = get_ct_logs(dom) if dom else {"ok": False, "entries": []}
+        w = enrich["whois"]
+        c = enrich["ssl"]
+        ct = enrich["ct"]
         boost = 0
         try:
             dstr = (w.get("creation_date") or "")
@@ -136,6 +98,7 @@ def compute_risk(parsed, model: str = "gemini"):
             "sample": brand_hit,
             "recommendation": "核验品牌官方域与签名，阻断仿冒内容。",
             "evidence": [
+                f"可疑域名: {dom or 'N/A'}",
                 f"品牌名称: {brand_hit}",
                 f"官方域: {brand_dom_hit or 'N/A'}",
                 f"相似度评分: {round(score_sim*100,2)}",
@@ -151,9 +114,9 @@ def compute_risk(parsed, model: str = "gemini"):
     if dom:
         norm_dom = normalize_homoglyph(dom)
         sim = visual_similarity(dom, norm_dom)
-        w2 = get_whois(dom)
-        c2 = get_ssl_cert(dom)
-        ct2 = get_ct_logs(dom)
+        w2 = enrich["whois"]
+        c2 = enrich["ssl"]
+        ct2 = enrich["ct"]
         ct_count2 = len(ct2.get("entries") or [])
         if sim >= 0.6:
             threats.append({
@@ -174,21 +137,129 @@ def compute_risk(parsed, model: str = "gemini"):
                     f"视觉相似度: {round(sim*100,2)}"
                 ]
             })
+    row = {
+        "domain": dom,
+        "registered": registered_domain(dom),
+        "brand": brand_hit,
+        "brand_similarity": round(score_sim * 100, 2) if brand_hit else 0,
+        "homoglyph_similarity": round(sim * 100, 2),
+        "whois": bool(enrich["whois"].get("ok")),
+        "ssl": bool(enrich["ssl"].get("ok")),
+        "ct_entries": len(enrich["ct"].get("entries") or []),
+        "timed_out": enrich.get("timed_out", []),
+    }
+    return threats, row
 
-    headers = parsed.get("meta", {}).get("headers", {})
-    auth = headers.get("Authentication-Results") or ""
-    spf = headers.get("Received-SPF") or ""
-    dkim = headers.get("DKIM-Signature") or ""
-    if not auth or ("fail" in auth.lower()) or ("softfail" in auth.lower()) or (not dkim):
+def compute_risk(parsed, model: str = "gemini", rules=None, stats=None, llm=None, config=None):
+    r = rules if rules is not None else basic_rules(parsed)
+    t = stats if stats is not None else text_stats(parsed.get("text"))
+    auth = header_auth(parsed)
+    # LLM 分析与各域名的情报查询同时发起；按首次出现顺序最多分析 DOMAIN_MAX 个注册域
+    doms = unique_domains(parsed.get("urls"), DOMAIN_MAX) if r["url"] > 0 else []
+    # 时间预算从查询发起时开始计算，与 LLM 分析的耗时重叠而不是叠加在其后
+    deadline = time.monotonic() + DOMAIN_BUDGET
+    enrich_futs = [(d, start_enrichment(d)) for d in doms or [""]]
+    decision, partial = (None, rule_score(r, t)) if llm is not None else cascade_decision(parsed, r, t, auth)
+    skipped = []
+    breaker_open = False
+    if decision:
+        llm = {}
+        skipped.append("llm")
+    elif llm is None:
+        # 由路由器选择提供方：慢请求对冲、失败降级、熔断跳过；情报查询已在后台进行
+        try:
+            llm = route_analyze(parsed.get("text"), model, config)
+        except BreakerOpen:
+            # 提供方全部熔断时不再等待超时，降级为仅按规则评分
+            llm = {}
+            skipped.append("llm")
+            breaker_open = True
+    score = min(100, int(
+        partial +
+        0.20 * llm.get("style_anomaly", 0) +
+        0.20 * llm.get("social_engineering", 0) +
+        0.15 * llm.get("llm_generated_probability", 0)
+    ))
+    floored = None
+    if decision == "rules_malicious" and score < CASCADE_FLOOR:
+        # 有意改变判定：危险附件加关键词命中的情形缺少 LLM 的贡献，基础公式会明显低估，
+        # 得分抬到 CASCADE_FLOOR 并在摘要中注明；已达下限时沿用基础公式
+        floored = min(100, int(CASCADE_FLOOR))
+        score = floored
+    level = level_from_score(score)
+    confidence = 0.5 + (score / 200.0)
+    summary = "关键词:{} URL:{} 附件:{} 文本困惑度:{} 突发度:{}".format(r["keyword"], r["url"], r["attachment"], round(t["perplexity"],2), round(t["burstiness"],2))
+    summary += " LLM风格异常:{} 社工评分:{} 生成概率:{}".format(llm.get("style_anomaly",0), llm.get("social_engineering",0), llm.get("llm_generated_probability",0))
+    if decision:
+        summary += " 级联判定:{}（已跳过 LLM）".format("规则明确恶意" if decision == "rules_malicious" else "规则明确良性")
+    if floored is not None:
+        summary += " 得分按规则下限 {} 计（基础公式 {}）".format(floored, int(partial))
+    if breaker_open:
+        summary += " LLM 提供方熔断中，仅按规则评分"
+    threats = []
+    sev = level_from_score
+    if r["keyword"] >= 30 or llm.get("social_engineering",0) >= 30:
+        threats.append({
+            "name": "社会工程诱导",
+            "severity": sev(max(r["keyword"], llm.get("social_engineering",0))),
+            "vector": "钓鱼话术与敏感信息索取",
+            "affected": ["邮箱收件人","账户登录接口"],
+            "impact": "凭据泄露与账户接管",
+            "sample": (parsed.get("text") or "")[:200],
+            "recommendation": get_advice("社会工程诱导")
+        })
+    if r["url"] > 0:
+        url = (parsed.get("urls") or [""])[0]
+        threats.append({
+            "name": "恶意链接",
+            "severity": sev(max(r["url"], llm.get("semantic_consistency",0))),
+            "vector": "链接重定向与仿冒站点",
+            "affected": ["浏览器","登录表单"],
+            "impact": "会话劫持与凭据收集",
+            "sample": url,
+            "recommendation": get_advice("恶意链接")
+        })
+    if r["attachment"] > 0:
+        att = (parsed.get("attachments") or [""])[0]
+        threats.append({
+            "name": "危险附件",
+            "severity": sev(r["attachment"]),
+            "vector": "可执行或宏文档",
+            "affected": ["终端系统","办公组件"],
+            "impact": "代码执行与持久化",
+            "sample": att,
+            "recommendation": get_advice("危险附件")
+        })
+    if llm.get("style_anomaly",0) >= 40 or llm.get("llm_generated_probability",0) >= 40:
+        threats.append({
+            "name": "生成文本伪装",
+            "severity": sev(max(llm.get("style_anomaly",0), llm.get("llm_generated_probability",0))),
+            "vector": "风格异常与模板化表述",
+            "affected": ["人机信任","审阅流程"],
+            "impact": "提高欺骗成功率",
+            "sample": summary,
+            "recommendation": get_advice("生成文本伪装")
+        })
+
+    text_all = (parsed.get("text") or "") + " " + (parsed.get("meta",{}).get("subject") or "")
+    # 各域名的情报查询已并发发起，这里在单封邮件的剩余时间预算内依次收集
+    domain_rows = []
+    for dom, futs in enrich_futs:
+        dom_threats, row = _domain_threats(dom, collect_enrichment(futs, deadline), text_all, sev)
+        threats.extend(dom_threats)
+        if dom:
+            domain_rows.append(row)
+
+    if auth["suspicious"]:
         threats.append({
             "name": "邮件头伪造",
             "severity": sev(70),
             "vector": "认证失败或缺失",
             "affected": ["邮件网关","收件人"],
             "impact": "冒充发件域与绕过过滤",
-            "sample": headers.get("From") or "",
+            "sample": auth["from"],
             "recommendation": "强制 SPF/DKIM/DMARC 校验与拒收策略。",
-            "evidence": [f"邮件头: 完整记录", f"SPF: {spf or 'N/A'}", f"DKIM: {('存在' if dkim else '缺失')}", f"认证结果: {auth or 'N/A'}"]
+            "evidence": [f"邮件头: 完整记录", f"SPF: {auth['spf'] or 'N/A'}", f"DKIM: {('存在' if auth['dkim'] else '缺失')}", f"认证结果: {auth['auth'] or 'N/A'}"]
         })
     chain = []
     if r["url"] > 0:
@@ -197,4 +268,5 @@ def compute_risk(parsed, model: str = "gemini"):
         chain = ["诱导内容","下载附件","执行宏/程序","系统受控"]
     else:
         chain = ["诱导内容","信息索取","数据泄露"]
-    return {"score": score, "confidence": round(min(1.0, confidence), 2), "level": level, "features": {"rules": r, "text": t, "llm": llm}, "summary": summary, "threats": threats, "chain": chain}
+    cascade = {"decision": decision, "partial_score": round(partial, 2), "skipped": skipped, "score_floor": floored}
+    return {"score": score, "confidence": round(min(1.0, confidence), 2), "level": level, "features": {"rules": r, "text": t, "llm": llm, "domains": domain_rows}, "summary": summary, "threats": threats, "chain": chain, "cascade": cascade}
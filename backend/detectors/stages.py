@@ -0,0 +1,73 @@
+from ..utils.whois_ct_ssl import lookup_whois, get_ssl_cert, get_ct_logs
+from ..services.latency import LATENCY
+from ..services import metrics
+import os
+import time
+import threading
+import concurrent.futures
+
+STAGE_WORKERS = int(os.environ.get("STAGE_WORKERS", "32"))
+
+# 只执行 WHOIS/TLS/CT 查询；LLM 调用由路由器自己的线程池执行，调用方线程直接等待，
+# 避免大量等待 LLM 的任务占满线程导致情报查询排队超时
+STAGE_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=STAGE_WORKERS, thread_name_prefix="stage"
+)
+
+def get_whois(domain):
+    data, hit = lookup_whois(domain)
+    metrics.WHOIS_CACHE.inc(result="hit" if hit else "miss")
+    return data
+
+
+LOOKUPS = {
+    "whois": LATENCY.timed("get_whois")(get_whois),
+    "ssl": LATENCY.timed("get_ssl_cert")(get_ssl_cert),
+    "ct": LATENCY.timed("get_ct_logs")(get_ct_logs),
+}
+
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _lookup(kind, domain):
+    # 同一域名的同类查询在进行中时直接复用同一个 future
+    key = (kind, domain)
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        if fut is not None:
+            return fut
+        fut = STAGE_POOL.submit(LOOKUPS[kind], domain)
+        _INFLIGHT[key] = fut
+
+    def _done(_):
+        with _INFLIGHT_LOCK:
+            if _INFLIGHT.get(key) is fut:
+                del _INFLIGHT[key]
+
+    fut.add_done_callback(_done)
+    return fut
+
+
+def start_enrichment(domain):
+    """并发发起 WHOIS/TLS/CT 查询，返回 {类型: future}"""
+    if not domain:
+        return {}
+    return {kind: _lookup(kind, domain) for kind in LOOKUPS}
+
+
+def collect_enrichment(futures, deadline=None):
+    """deadline 为 time.monotonic() 截止时刻，超时的查询按失败处理并记入 timed_out"""
+    empty = {"whois": {"ok": False}, "ssl": {"ok": False}, "ct": {"ok": False, "entries": []}}
+    out = dict(empty)
+    out["timed_out"] = []
+    for kind, fut in futures.items():
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            out[kind] = fut.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            out[kind] = empty[kind]
+            out["timed_out"].append(kind)
+        except Exception:
+            out[kind] = empty[kind]
+    return out
@@ -0,0 +1,132 @@
+"""
+批量评分：把 N 封邮件的规则/文本/LLM 特征排成矩阵，用 NumPy 数组运算一次算出
+得分、等级、置信度与各类威胁的触发情况，结果与 ensemble.compute_risk 逐封计算一致。
+
+品牌冒充与域名同形异义依赖实时的 WHOIS/证书情报，不在批量评分范围内。
+"""
+import numpy as np
+
+from . import ensemble
+
+COLUMNS = (
+    "keyword",
+    "url",
+    "attachment",
+    "perplexity",
+    "burstiness",
+    "style_anomaly",
+    "social_engineering",
+    "llm_generated_probability",
+    "semantic_consistency",
+    "rules_malicious",
+    "auth_suspicious",
+)
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+_LEVELS = np.array(ensemble.LEVELS, dtype=object)
+_BOUNDS = np.array(ensemble.LEVEL_BOUNDS)
+
+
+def feature_row(rules, stats, llm=None, decision=None, auth_suspicious=False):
+    llm = llm or {}
+    return [
+        rules["keyword"],
+        rules["url"],
+        rules["attachment"],
+        stats["perplexity"],
+        stats["burstiness"],
+        llm.get("style_anomaly", 0),
+        llm.get("social_engineering", 0),
+        llm.get("llm_generated_probability", 0),
+        llm.get("semantic_consistency", 0),
+        1 if decision == "rules_malicious" else 0,
+        1 if auth_suspicious else 0,
+    ]
+
+
+def from_report(report):
+    """由已保存的报告还原特征行；邮件头结论取自报告中的威胁列表"""
+    feats = report.get("features") or {}
+    cascade = report.get("cascade") or {}
+    auth = any(t.get("name") == "邮件头伪造" for t in report.get("threats") or [])
+    return feature_row(
+        feats.get("rules") or {"keyword": 0, "url": 0, "attachment": 0},
+        feats.get("text") or {"perplexity": 0.0, "burstiness": 0.0},
+        feats.get("llm"),
+        cascade.get("decision"),
+        auth,
+    )
+
+
+def matrix(rows):
+    return np.asarray(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+
+
+def _ladder(v):
+    # 与 level_from_score 相同的阈值：bisect_right 等价于 searchsorted(side="right")
+    return _LEVELS[np.searchsorted(_BOUNDS, v, side="right")]
+
+
+def score_batch(X):
+    X = matrix(X)
+    c = {name: X[:, i] for name, i in _COL.items()}
+    # 运算顺序与 rule_score / compute_risk 保持一致，保证浮点结果逐位相同
+    partial = (
+        0.45 * c["keyword"] +
+        0.25 * c["url"] +
+        0.15 * c["attachment"] +
+        0.15 * c["perplexity"] +
+        0.10 * c["burstiness"]
+    )
+    raw = (
+        partial +
+        0.20 * c["style_anomaly"] +
+        0.20 * c["social_engineering"] +
+        0.15 * c["llm_generated_probability"]
+    )
+    score = np.minimum(100, np.trunc(raw).astype(np.int64))
+    # 与 compute_risk 相同：规则明确恶意且得分低于 CASCADE_FLOOR 时取下限，否则即为基础公式得分
+    floor = min(100, int(ensemble.CASCADE_FLOOR))
+    score = np.where((c["rules_malicious"] > 0) & (score < ensemble.CASCADE_FLOOR), floor, score)
+
+    # 置信度只取决于整数得分，查表以复用 Python round 的舍入结果
+    lo = min(0, int(score.min())) if len(score) else 0
+    table = np.array([round(min(1.0, 0.5 + (s / 200.0)), 2) for s in range(lo, 101)])
+    confidence = table[score - lo]
+
+    kw, se = c["keyword"], c["social_engineering"]
+    sa, gp = c["style_anomaly"], c["llm_generated_probability"]
+    threats = {
+        "社会工程诱导": ((kw >= 30) | (se >= 30), _ladder(np.maximum(kw, se))),
+        "恶意链接": (c["url"] > 0, _ladder(np.maximum(c["url"], c["semantic_consistency"]))),
+        "危险附件": (c["attachment"] > 0, _ladder(c["attachment"])),
+        "生成文本伪装": ((sa >= 40) | (gp >= 40), _ladder(np.maximum(sa, gp))),
+        "邮件头伪造": (c["auth_suspicious"] > 0, np.full(len(score), ensemble.level_from_score(70), dtype=object)),
+    }
+    return {
+        "score": score,
+        "level": _ladder(score),
+        "confidence": confidence,
+        "partial_score": partial,
+        "threats": threats,
+    }
+
+
+def results(batch):
+    """把批量结果展开为逐封的 {score, level, confidence, threats}，威胁顺序与 compute_risk 相同"""
+    names = list(batch["threats"])
+    for i in range(len(batch["score"])):
+        yield {
+            "score": int(batch["score"][i]),
+            "level": batch["level"][i],
+            "confidence": float(batch["confidence"][i]),
+            "threats": [
+                {"name": n, "severity": batch["threats"][n][1][i]}
+                for n in names
+                if batch["threats"][n][0][i]
+            ],
+        }
+
+
+def rescore(reports):
+    """对已保存的报告按当前权重重新评分"""
+    return list(results(score_batch([from_report(r) for r in reports])))
@@ -0,0 +1,107 @@
+import threading
+from datetime import datetime, timezone
+
+LEVELS = ("低", "中", "高", "危急")
+ALERT_LEVELS = ("高", "危急")
+FEATURES = ("keyword", "url", "attachment")
+LLM_FIELDS = ("style_anomaly", "social_engineering", "llm_generated_probability")
+BINS = 10
+
+
+def _contribution(entry, report):
+    """一条历史记录对各项统计的贡献；删除时按同样的贡献扣减"""
+    score = int(entry.get("score", 0))
+    ts = entry.get("ts")
+    date = ts[:10] if isinstance(ts, str) and len(ts) >= 10 else datetime.now(timezone.utc).date().isoformat()
+    feats = None
+    llm = None
+    if report:
+        rules = report.get("features", {}).get("rules", {})
+        feats = tuple(float(rules.get(k, 0)) for k in FEATURES)
+        raw = report.get("features", {}).get("llm", {})
+        if isinstance(raw, dict) and raw:
+            llm = tuple(float(raw.get(k, 0)) for k in LLM_FIELDS)
+    return entry.get("level", "低"), score, min(BINS - 1, max(0, score // 10)), date, feats, llm
+
+
+class Aggregates:
+    """
+    /api/stats 所需的运行汇总：等级计数、得分直方图、每日计数以及特征与 LLM 均值的累加和；
+    新增与删除报告时 O(1) 更新，读取时不再遍历历史记录。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._parts = {}
+            self._levels = dict.fromkeys(LEVELS, 0)
+            self._hist = [0] * BINS
+            self._daily = {}
+            self._risk = 0
+            self._feat = [0.0] * len(FEATURES)
+            self._llm = [0.0] * len(LLM_FIELDS)
+            self._llm_count = 0
+
+    def _apply(self, part, sign):
+        level, score, b, date, feats, llm = part
+        self._levels[level] = self._levels.get(level, 0) + sign
+        if not self._levels[level] and level not in LEVELS:
+            del self._levels[level]
+        self._hist[b] += sign
+        self._daily[date] = self._daily.get(date, 0) + sign
+        if not self._daily[date]:
+            del self._daily[date]
+        self._risk += sign * score
+        if feats:
+            for i, v in enumerate(feats):
+                self._feat[i] += sign * v
+        if llm:
+            self._llm_count += sign
+            for i, v in enumerate(llm):
+                self._llm[i] += sign * v
+
+    def add(self, entry, report=None):
+        part = _contribution(entry, report)
+        with self._lock:
+            old = self._parts.pop(entry["id"], None)
+            if old:
+                self._apply(old, -1)
+            self._parts[entry["id"]] = part
+            self._apply(part, 1)
+
+    def remove(self, rid):
+        with self._lock:
+            part = self._parts.pop(rid, None)
+            if part:
+                self._apply(part, -1)
+            return part is not None
+
+    def snapshot(self):
+        with self._lock:
+            total = len(self._parts)
+            levels = dict(self._levels)
+            hist = list(self._hist)
+            daily = sorted(self._daily.items())
+            risk = self._risk
+            feat = list(self._feat)
+            llm = list(self._llm)
+            llm_count = self._llm_count
+        llm_avg = dict.fromkeys(LLM_FIELDS, 0.0)
+        if llm_count > 0:
+            llm_avg = {k: round(v / llm_count, 2) for k, v in zip(LLM_FIELDS, llm)}
+        llm_avg["available_ratio"] = round((llm_count / total) if total else 0.0, 2)
+        return {
+            "total": total,
+            "levels": levels,
+            "avg": {"risk": round(risk / total, 2) if total else 0.0},
+            "risk_histogram": {
+                "bins": [f"{i*10}-{(i+1)*10}" for i in range(BINS)],
+                "counts": hist,
+            },
+            "daily": [{"date": d, "count": c} for d, c in daily],
+            "features_avg": {k: round(v / total, 2) if total else 0.0 for k, v in zip(FEATURES, feat)},
+            "llm_avg": llm_avg,
+        }
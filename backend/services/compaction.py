@@ -0,0 +1,157 @@
+import os
+import re
+from ..features.rules import SUSPICIOUS_KEYWORDS
+
+ENABLED = os.environ.get("LLM_COMPACT", "1") != "0"
+TOKEN_BUDGET = int(os.environ.get("LLM_TOKEN_BUDGET", "3000"))
+
+# 回复链起始标记：其后的内容视为引用历史，预算不足时优先舍弃
+REPLY_RE = re.compile(
+    r"^\s*(-{2,}\s*(original message|原始邮件)\s*-{2,}"
+    r"|on .{0,200}wrote:"
+    r"|在.{0,100}写道[:：]"
+    r"|(from|发件人)[:：].*\n\s*(sent|date|发送时间|时间)[:：].*)\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# 转发标记：其后是被转发的原文，常是真正的钓鱼内容，与正文同等对待
+FORWARD_RE = re.compile(
+    r"^\s*(-{2,}\s*(forwarded message|转发邮件|转发的邮件)\s*-{2,}"
+    r"|begin forwarded message:|开始转发的邮件[:：])\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Outlook 的回复与转发都使用 From/Sent 头，只能按紧随其后的主题前缀区分
+FORWARD_SUBJECT_RE = re.compile(r"^\s*(subject|主题)[:：]\s*(fwd?|转发)\s*[:：]", re.IGNORECASE | re.MULTILINE)
+HEADER_LINES = 4
+SIGNATURE_RE = re.compile(r"^-- ?$", re.MULTILINE)
+QUOTE_RE = re.compile(r"^\s*>.*$", re.MULTILINE)
+QUOTED_PREFIX_RE = re.compile(r"^\s*(>\s?)+")
+FOOTER_RE = re.compile(
+    r"unsubscribe|退订|取消订阅|view (it )?in (your )?browser|confidential|disclaimer|免责声明"
+    r"|this (e-?mail|message) and any attachments|版权所有|all rights reserved|copyright",
+    re.IGNORECASE,
+)
+URL_RE = re.compile(r"https?://\S+", re.IGNORECASE)
+SALIENT_RE = re.compile(
+    r"付款|支付|转账|汇款|发票|账单|退款|银行|信用卡|账号|账户|登录|密码|验证码|口令|凭证|冻结|过期"
+    r"|payment|invoice|wire|transfer|refund|bank|credit card|account|login|log in|sign in"
+    r"|password|passcode|credential|ssn|suspend|expire",
+    re.IGNORECASE,
+)
+SENT_SPLIT_RE = re.compile(r"(?<=[。！？!?])|(?<=[.;])\s+|\n+")
+SPACE_RE = re.compile(r"[ \t　\xa0]+")
+BLANK_RE = re.compile(r"\n\s*\n+")
+CJK_RE = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+
+_KEYWORDS = [k.lower() for k in SUSPICIOUS_KEYWORDS]
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    cjk = len(CJK_RE.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _is_forward(text, end):
+    head = "\n".join(text[end:].split("\n", HEADER_LINES + 1)[:HEADER_LINES + 1])
+    return bool(FORWARD_SUBJECT_RE.search(head))
+
+
+def _segments(text):
+    """按回复/转发标记切分，返回 [(是否引用历史, 段落)]；首段为正文，转发的原文视同正文"""
+    marks = [(m.start(), m.end(), False) for m in FORWARD_RE.finditer(text)]
+    marks += [(m.start(), m.end(), True) for m in REPLY_RE.finditer(text)]
+    marks.sort()
+    parts = []
+    quoted = False
+    pos = 0
+    prev_end = -1
+    for start, end, reply in marks:
+        if start < pos:
+            continue
+        if reply and prev_end >= 0 and not text[prev_end:start].strip():
+            # 紧跟在转发标记后的 From/Date 头属于被转发的邮件
+            continue
+        parts.append((quoted, text[pos:start]))
+        quoted = reply and not _is_forward(text, end)
+        # 引用历史去掉标记本身；转发保留发件人、主题等头部信息
+        pos = end if quoted else start
+        prev_end = -1 if quoted else end
+    parts.append((quoted, text[pos:]))
+    return parts
+
+
+def _clean(chunks):
+    lines = []
+    for line in "\n".join(chunks).split("\n"):
+        if FOOTER_RE.search(line) and not _keyword_hits(line):
+            continue
+        lines.append(SPACE_RE.sub(" ", line).strip())
+    return BLANK_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def split_noise(text):
+    """
+    返回 (正文, 引用历史)：正文含转发的原文，引用历史含回复链与 > 引用行；
+    两部分都去除签名、模板化页脚与多余空白。
+    """
+    body = []
+    history = []
+    for quoted, seg in _segments(text):
+        m = SIGNATURE_RE.search(seg)
+        if m and m.start() > 0:
+            seg = seg[: m.start()]
+        (history if quoted else body).append(QUOTE_RE.sub("", seg))
+        history.extend(QUOTED_PREFIX_RE.sub("", q) for q in QUOTE_RE.findall(seg))
+    return _clean(body), _clean(history)
+
+
+def strip_noise(text):
+    return "\n\n".join(p for p in split_noise(text) if p)
+
+
+def _keyword_hits(s):
+    low = s.lower()
+    return sum(1 for k in _KEYWORDS if k in low)
+
+
+def salience(sentence):
+    score = 3 * _keyword_hits(sentence)
+    score += 3 * len(URL_RE.findall(sentence))
+    score += 2 * len(SALIENT_RE.findall(sentence))
+    return score
+
+
+def compact_text(text, budget=TOKEN_BUDGET):
+    if not ENABLED or not text:
+        return text or ""
+    body, history = split_noise(text)
+    text = "\n\n".join(p for p in (body, history) if p)
+    if estimate_tokens(text) <= budget:
+        return text
+    # 引用历史排在正文之后，显著性相同时优先保留正文；历史中的链接等高显著性句子仍可入选
+    sents = [s.strip() for part in (body, history) for s in SENT_SPLIT_RE.split(part) if s and s.strip()]
+    ranked = sorted(
+        range(len(sents)),
+        # 开头两句保留上下文（称呼、来意），其余按显著性排序
+        key=lambda i: (-(salience(sents[i]) + (1 if i < 2 else 0)), i),
+    )
+    keep = []
+    seen = set()
+    used = 0
+    for i in ranked:
+        cost = estimate_tokens(sents[i])
+        if sents[i] in seen or used + cost > budget:
+            continue
+        seen.add(sents[i])
+        keep.append(i)
+        used += cost
+    keep.sort()
+    out = []
+    prev = -1
+    for i in keep:
+        if prev >= 0 and i != prev + 1:
+            out.append("…")
+        out.append(sents[i])
+        prev = i
+    return "\n".join(out)
@@ -0,0 +1,71 @@
+import re
+import hashlib
+import threading
+
+WS_RE = re.compile(r"\s+")
+
+# 投递过程中会变化的头部（收件人、Message-ID、日期等）不参与归一化摘要
+STABLE_META = ["from", "subject"]
+
+
+def raw_digest(data):
+    return hashlib.sha256(data or b"").hexdigest()
+
+
+def normalized_digest(parsed):
+    meta = parsed.get("meta") or {}
+    parts = [WS_RE.sub(" ", parsed.get("text") or "").strip()]
+    for k in STABLE_META:
+        parts.append(WS_RE.sub(" ", str(meta.get(k) or "")).strip().lower())
+    parts.append("\n".join(sorted(parsed.get("attachments") or [])))
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class DedupIndex:
+    """摘要 -> 报告 ID 的索引，raw 为原始字节摘要，normalized 为归一化正文摘要"""
+
+    KINDS = ("raw", "normalized")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._maps = {k: {} for k in self.KINDS}
+        self.hits = {k: 0 for k in self.KINDS}
+        self.misses = {k: 0 for k in self.KINDS}
+
+    def get(self, kind, digest):
+        with self._lock:
+            rid = self._maps[kind].get(digest)
+            if rid:
+                self.hits[kind] += 1
+            else:
+                self.misses[kind] += 1
+            return rid
+
+    def put(self, kind, digest, report_id):
+        if not digest:
+            return
+        with self._lock:
+            self._maps[kind].setdefault(digest, report_id)
+
+    def register(self, report):
+        for kind, digest in (report.get("digest") or {}).items():
+            if kind in self._maps:
+                self.put(kind, digest, report["id"])
+
+    def forget(self, report_id, digests=None):
+        with self._lock:
+            for kind, digest in (digests or {}).items():
+                m = self._maps.get(kind)
+                if m is not None and m.get(digest) == report_id:
+                    del m[digest]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": {k: len(v) for k, v in self._maps.items()},
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+            }
+
+
+DEDUP = DedupIndex()
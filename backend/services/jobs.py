@@ -0,0 +1,103 @@
+import os
+import time
+import queue
+import logging
+import threading
+
+WORKERS = int(os.environ.get("JOB_WORKERS", "4"))
+QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "1000"))
+
+
+class JobQueue:
+    """有界工作线程池：从队列中逐个取出单文件任务执行"""
+
+    def __init__(self, workers=WORKERS, maxsize=QUEUE_MAX):
+        self.workers = max(1, int(workers))
+        self.maxsize = max(1, int(maxsize))
+        self._q = queue.Queue(maxsize=self.maxsize)
+        self._lock = threading.Lock()
+        # 入队互斥：检查剩余容量与入队之间不会被其他提交者插入
+        self._submit_lock = threading.Lock()
+        self._threads = []
+        self._busy = 0
+        self._processed = 0
+        self._failed = 0
+        self._busy_seconds = 0.0
+        self._started_at = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._started_at = time.monotonic()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def remaining(self):
+        return max(0, self.maxsize - self._q.qsize())
+
+    def submit(self, fn, *args, **kwargs):
+        self._ensure_started()
+        with self._submit_lock:
+            self._q.put((fn, args, kwargs), timeout=5)
+
+    def submit_many(self, calls):
+        """一次性入队 [(fn, args)]；容量不足时全部不入队并抛出 queue.Full"""
+        self._ensure_started()
+        with self._submit_lock:
+            # 工作线程只会取走任务，检查通过后剩余容量不会再减少
+            if self.remaining() < len(calls):
+                raise queue.Full
+            for fn, args in calls:
+                self._q.put_nowait((fn, args, {}))
+
+    def join(self):
+        self._q.join()
+
+    def _run(self):
+        while True:
+            fn, args, kwargs = self._q.get()
+            with self._lock:
+                self._busy += 1
+            t0 = time.monotonic()
+            failed = False
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                logging.exception("job task failed")
+            finally:
+                elapsed = time.monotonic() - t0
+                with self._lock:
+                    self._busy -= 1
+                    self._processed += 1
+                    self._failed += 1 if failed else 0
+                    self._busy_seconds += elapsed
+                self._q.task_done()
+
+    def stats(self):
+        with self._lock:
+            busy = self._busy
+            processed = self._processed
+            failed = self._failed
+            busy_seconds = self._busy_seconds
+            started_at = self._started_at
+        uptime = (time.monotonic() - started_at) if started_at else 0.0
+        capacity = uptime * self.workers
+        return {
+            "workers": self.workers,
+            "busy": busy,
+            "idle": self.workers - busy,
+            "queue_depth": self._q.qsize(),
+            "queue_max": self.maxsize,
+            "processed": processed,
+            "failed": failed,
+            "utilisation": round(busy / self.workers, 3),
+            "avg_utilisation": round(busy_seconds / capacity, 3) if capacity else 0.0,
+            "uptime": round(uptime, 1),
+        }
+
+
+JOB_QUEUE = JobQueue()
@@ -0,0 +1,143 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+WINDOW = float(os.environ.get("LATENCY_WINDOW", "300"))
+SLOTS = int(os.environ.get("LATENCY_SLOTS", "10"))
+
+# 固定分桶上界（毫秒），最后一个桶收纳所有更慢的样本
+BOUNDS_MS = [
+    1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 200, 300, 500, 750,
+    1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 20000, 30000, 60000,
+]
+
+
+class Histogram:
+    """
+    滑动窗口直方图：窗口切成 SLOTS 个时间片，每片一组固定分桶计数；
+    记录只做一次二分查找和两次加法，过期时间片在复用时清零。
+    """
+
+    def __init__(self, window=WINDOW, slots=SLOTS):
+        self.slot_len = max(0.001, window / max(1, slots))
+        self.slots = max(1, slots)
+        self._lock = threading.Lock()
+        self._epochs = [-1] * self.slots
+        self._counts = [[0] * (len(BOUNDS_MS) + 1) for _ in range(self.slots)]
+        self._sums = [0.0] * self.slots
+        self.total = 0
+
+    def record(self, ms, now=None):
+        epoch = int((time.monotonic() if now is None else now) / self.slot_len)
+        i = epoch % self.slots
+        b = bisect.bisect_left(BOUNDS_MS, ms)
+        with self._lock:
+            if self._epochs[i] != epoch:
+                self._epochs[i] = epoch
+                self._counts[i] = [0] * (len(BOUNDS_MS) + 1)
+                self._sums[i] = 0.0
+            self._counts[i][b] += 1
+            self._sums[i] += ms
+            self.total += 1
+
+    def _merged(self, now=None):
+        epoch = int((time.monotonic() if now is None else now) / self.slot_len)
+        merged = [0] * (len(BOUNDS_MS) + 1)
+        total = 0.0
+        with self._lock:
+            for i in range(self.slots):
+                if epoch - self._epochs[i] < self.slots:
+                    for b, c in enumerate(self._counts[i]):
+                        merged[b] += c
+                    total += self._sums[i]
+        return merged, total
+
+    @staticmethod
+    def _quantile(counts, n, q):
+        rank = q * n
+        seen = 0
+        for b, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lo = BOUNDS_MS[b - 1] if b > 0 else 0
+                hi = BOUNDS_MS[b] if b < len(BOUNDS_MS) else BOUNDS_MS[-1]
+                # 桶内线性插值
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return 0.0
+
+    def snapshot(self, now=None):
+        counts, total = self._merged(now)
+        n = sum(counts)
+        if not n:
+            return {"count": 0, "p50": None, "p95": None, "p99": None, "mean": None}
+        return {
+            "count": n,
+            "p50": round(self._quantile(counts, n, 0.50), 1),
+            "p95": round(self._quantile(counts, n, 0.95), 1),
+            "p99": round(self._quantile(counts, n, 0.99), 1),
+            "mean": round(total / n, 1),
+        }
+
+
+class LatencyRegistry:
+    """按 (阶段, 提供方) 维护直方图"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hists = {}
+
+    def _hist(self, stage, provider=None):
+        key = (stage, provider)
+        h = self._hists.get(key)
+        if h is None:
+            with self._lock:
+                h = self._hists.setdefault(key, Histogram())
+        return h
+
+    def record(self, stage, seconds, provider=None):
+        self._hist(stage, provider).record(seconds * 1000.0)
+
+    def record_many(self, timings, provider=None):
+        for stage, seconds in timings.items():
+            self.record(stage, seconds, provider)
+
+    @contextmanager
+    def timer(self, stage, provider=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0, provider)
+
+    def timed(self, stage):
+        def wrap(fn):
+            def inner(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - t0)
+
+            inner.__name__ = getattr(fn, "__name__", stage)
+            inner.__doc__ = getattr(fn, "__doc__", None)
+            return inner
+
+        return wrap
+
+    def snapshot(self):
+        with self._lock:
+            items = list(self._hists.items())
+        stages = {}
+        providers = {}
+        for (stage, provider), h in sorted(items, key=lambda kv: (kv[0][0], kv[0][1] or "")):
+            snap = h.snapshot()
+            if provider is None:
+                stages[stage] = snap
+            else:
+                providers.setdefault(provider, {})[stage] = snap
+        return {"window": WINDOW, "stages": stages, "providers": providers}
+
+
+LATENCY = LatencyRegistry()
@@ -0,0 +1,142 @@
+import os
+import json
+import concurrent.futures
+from .compaction import estimate_tokens
+from .llm_cache import lookup as cache_lookup, store as cache_store
+from .llm_common import FIELDS, PROMPT_VERSION, clean, to_result
+from . import llm_engine, rate_limit, metrics
+
+TOKEN_BUDGET = int(os.environ.get("LLM_BATCH_TOKENS", "6000"))
+MAX_ITEMS = int(os.environ.get("LLM_BATCH_MAX_ITEMS", "20"))
+# 超过该长度的邮件不参与打包，直接单独分析
+ITEM_MAX_TOKENS = int(os.environ.get("LLM_BATCH_ITEM_TOKENS", "1500"))
+
+BATCH_PROMPT = (
+    "你是安全检测助手。下面按编号给出多封邮件正文，请逐封进行钓鱼风险分析，"
+    "输出 JSON 数组，每个元素对应一封邮件：\n"
+    "[\n"
+    "  {\n"
+    "    \"id\": 邮件编号,\n"
+    "    \"semantic_consistency\": 0-100,\n"
+    "    \"style_anomaly\": 0-100,\n"
+    "    \"social_engineering\": 0-100,\n"
+    "    \"llm_generated_probability\": 0-100,\n"
+    "    \"evidence\": \"关键依据简述\"\n"
+    "  }\n"
+    "]。数组需覆盖全部编号，仅返回 JSON，不要解释。\n"
+)
+
+def pack(texts, budget=TOKEN_BUDGET, max_items=MAX_ITEMS):
+    """按 token 预算把文本下标贪心分组"""
+    groups = []
+    cur = []
+    used = estimate_tokens(BATCH_PROMPT)
+    base = used
+    for i, t in enumerate(texts):
+        cost = estimate_tokens(t) + 8
+        if cur and (used + cost > budget or len(cur) >= max_items):
+            groups.append(cur)
+            cur = []
+            used = base
+        cur.append(i)
+        used += cost
+    if cur:
+        groups.append(cur)
+    return groups
+
+
+def build_content(items):
+    return "\n".join(f"=== 邮件 {k} ===\n{text}\n" for k, text in items)
+
+
+def parse_array(text):
+    """解析模型返回的 JSON 数组，返回 {编号: 结果}"""
+    text = text or ""
+    try:
+        arr = json.loads(text)
+    except Exception:
+        arr = None
+        start = text.find("[")
+        end = text.rfind("]")
+        if start != -1 and end > start:
+            try:
+                arr = json.loads(text[start : end + 1])
+            except Exception:
+                arr = None
+    out = {}
+    if not isinstance(arr, list):
+        return out
+    for item in arr:
+        if not isinstance(item, dict) or not all(f in item for f in FIELDS):
+            continue
+        try:
+            out[int(item.get("id"))] = item
+        except Exception:
+            continue
+    return out
+
+
+def run_batch(texts, provider, model, prompt_version, clean, complete, timeout, limiter=None, name=None):
+    """
+    clean(text) 返回送入模型的文本；complete(system, user) 返回模型原始输出。
+    返回与 texts 等长的列表；过长、打包失败或数组中缺失的邮件为 None，
+    由调用方按单封流程经路由并发分析，这里不再串行补做。
+    limiter 为提供方的自适应限流器，打包请求与单封请求共享同一配额。
+    name 为调用指标中的提供方名称，默认同 provider；发出的请求全部失败时抛出最后一个错误，
+    由路由计入熔断状态。
+    """
+    results = [None] * len(texts)
+    cleaned = [clean(t) for t in texts]
+    keys = [None] * len(texts)
+    batchable = []
+    for i, c in enumerate(cleaned):
+        keys[i], cached = cache_lookup(provider, model, prompt_version, c)
+        if cached is not None:
+            results[i] = cached
+        elif estimate_tokens(c) <= ITEM_MAX_TOKENS:
+            batchable.append(i)
+
+    futs = []
+    for group in pack([cleaned[i] for i in batchable]):
+        idxs = [batchable[j] for j in group]
+        content = build_content([(k, cleaned[i]) for k, i in enumerate(idxs)])
+        submit = limiter.submit if limiter is not None else llm_engine.submit
+        fut = submit(complete, BATCH_PROMPT, content)
+        futs.append((idxs, fut))
+
+    name = name or provider
+    last_err = None
+    failed = 0
+    for idxs, fut in futs:
+        # 与单封路径口径一致：每封送入模型的邮件计一次调用
+        metrics.LLM_CALLS.inc(len(idxs), provider=name)
+        try:
+            parsed = parse_array(fut.result(timeout=timeout))
+        except Exception as e:
+            if isinstance(e, concurrent.futures.TimeoutError):
+                # 已在执行的请求无法取消，直接记为一次过载信号
+                if not fut.cancel() and limiter is not None:
+                    limiter.on_throttle()
+                e = llm_engine.LLMTimeout(f"打包请求超时（{timeout}s）")
+            metrics.LLM_FAILURES.inc(len(idxs), provider=name)
+            last_err = e
+            failed += 1
+            parsed = {}
+        for k, i in enumerate(idxs):
+            item = parsed.get(k)
+            if item is None:
+                continue
+            results[i] = to_result(item)
+            cache_store(keys[i], results[i])
+    if futs and failed == len(futs):
+        raise last_err
+    return results
+
+
+def analyze(config, texts, complete, timeout, cache_name=None):
+    """多封短邮件打包为一次请求分析，complete(config, system, user) 为提供方的传输调用"""
+    return run_batch(
+        texts, cache_name or config.provider, config.cache_model, PROMPT_VERSION, clean,
+        lambda system, user: complete(config, system, user), timeout,
+        limiter=rate_limit.get(config.provider, config), name=config.provider,
+    )
@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
+
+CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "llm_cache.sqlite3"),
+)
+TTL = int(os.environ.get("LLM_CACHE_TTL", str(7 * 86400)))
+CAPACITY = int(os.environ.get("LLM_CACHE_SIZE", "2048"))
+ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+
+
+def make_key(provider, model, prompt_version, text):
+    digest = hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+    return f"{provider}:{model}:{prompt_version}:{digest}"
+
+
+class VerdictCache:
+    """LLM 判定缓存：内存 LRU 在前，SQLite 持久化在后，均按 TTL 过期"""
+
+    def __init__(self, path=CACHE_PATH, ttl=TTL, capacity=CAPACITY):
+        self.path = path
+        self.ttl = ttl
+        self.capacity = max(1, int(capacity))
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._conn = None
+        self._puts = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, ts REAL, value TEXT)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key, ts, value):
+        self._lru[key] = (ts, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            ent = self._lru.get(key)
+            if ent is not None:
+                if now - ent[0] < self.ttl:
+                    self._lru.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(ent[1])
+                del self._lru[key]
+                self.expired += 1
+            try:
+                row = self._db().execute(
+                    "SELECT ts, value FROM verdicts WHERE key = ?", (key,)
+                ).fetchone()
+            except Exception:
+                row = None
+            if row and now - row[0] < self.ttl:
+                value = json.loads(row[1])
+                self._remember(key, row[0], value)
+                self.disk_hits += 1
+                return dict(value)
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, dict(value))
+            try:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, ts, value) VALUES (?, ?, ?)",
+                    (key, now, json.dumps(value, ensure_ascii=False)),
+                )
+                self._puts += 1
+                if self._puts % 500 == 0:
+                    db.execute("DELETE FROM verdicts WHERE ts < ?", (now - self.ttl,))
+                db.commit()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "enabled": ENABLED,
+                "memory_entries": len(self._lru),
+                "capacity": self.capacity,
+                "ttl": self.ttl,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_ratio": round(hits / total, 3) if total else 0.0,
+            }
+
+
+VERDICT_CACHE = VerdictCache()
+
+
+# 当前线程/协程最近一次查询是否命中，供路由器区分缓存命中与真实的提供方往返
+_HIT = contextvars.ContextVar("llm_cache_hit", default=False)
+
+
+def reset_hit():
+    _HIT.set(False)
+
+
+def last_hit():
+    return _HIT.get()
+
+
+def lookup(provider, model, prompt_version, text):
+    if not ENABLED:
+        return None, None
+    key = make_key(provider, model, prompt_version, text)
+    value = VERDICT_CACHE.get(key)
+    _HIT.set(value is not None)
+    return key, value
+
+
+def store(key, value):
+    if ENABLED and key:
+        VERDICT_CACHE.put(key, value)
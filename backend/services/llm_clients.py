@@ -0,0 +1,152 @@
+import os
+import threading
+import http.client
+from collections import deque, OrderedDict
+from urllib.parse import urlsplit
+
+POOL_SIZE = int(os.environ.get("LLM_HTTP_POOL_SIZE", "8"))
+# 租户可在请求头中自带密钥，缓存的 SDK 客户端数量需要有上限
+CLIENT_CACHE_SIZE = int(os.environ.get("LLM_CLIENT_CACHE_SIZE", "64"))
+
+
+class HTTPStatusError(RuntimeError):
+    def __init__(self, status, body=""):
+        super().__init__(f"HTTP {status}: {body[:200]}")
+        self.status = status
+
+
+class ClientPool:
+    """按 (provider, api_key, base_url) 缓存长生命周期的 SDK 客户端，超出容量时淘汰最久未用的"""
+
+    def __init__(self, capacity=CLIENT_CACHE_SIZE):
+        self.capacity = max(1, int(capacity))
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+
+    def get(self, key, factory):
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory()
+                self._clients[key] = client
+                # 淘汰时仅丢弃引用，不主动关闭，避免打断正在进行的调用
+                while len(self._clients) > self.capacity:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(key)
+            return client
+
+    def stats(self):
+        with self._lock:
+            out = {}
+            for key in self._clients:
+                out[key[0]] = out.get(key[0], 0) + 1
+            return out
+
+
+class KeepAlivePool:
+    """每个 (scheme, host, port) 维护一组可复用的 HTTP 长连接"""
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = max(1, int(size))
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+        self.reused = 0
+
+    def _acquire(self, origin, timeout):
+        with self._lock:
+            idle = self._idle.get(origin)
+            if idle:
+                self.reused += 1
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.created += 1
+        scheme, host, port = origin
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def _release(self, origin, conn):
+        with self._lock:
+            idle = self._idle.setdefault(origin, deque())
+            if len(idle) < self.size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    @staticmethod
+    def _target(url):
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        return (scheme, parts.hostname, port), path
+
+    def _open(self, method, url, body=None, headers=None, timeout=60):
+        """发送请求并读取响应头，返回 (origin, 连接, 响应)；失败时连接已关闭"""
+        origin, path = self._target(url)
+        hdrs = dict(headers or {})
+        hdrs.setdefault("Connection", "keep-alive")
+        for attempt in range(2):
+            conn, reused = self._acquire(origin, timeout)
+            try:
+                conn.request(method, path, body=body, headers=hdrs)
+                return origin, conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # 复用的空闲连接可能已被服务端关闭，换新连接重试一次
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+    def request(self, method, url, body=None, headers=None, timeout=60):
+        origin, conn, resp = self._open(method, url, body, headers, timeout)
+        try:
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(origin, conn)
+        text = data.decode("utf-8", errors="replace")
+        if resp.status >= 400:
+            raise HTTPStatusError(resp.status, text)
+        return text
+
+    def stream_lines(self, method, url, body=None, headers=None, timeout=60):
+        """逐行读取响应（SSE）；提前关闭时连接不可复用，直接丢弃"""
+        origin, conn, resp = self._open(method, url, body, headers, timeout)
+        finished = False
+        try:
+            if resp.status >= 400:
+                raise HTTPStatusError(resp.status, resp.read().decode("utf-8", errors="replace"))
+            for raw in resp:
+                yield raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            finished = not resp.will_close
+        finally:
+            if finished:
+                self._release(origin, conn)
+            else:
+                conn.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "idle": sum(len(v) for v in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+
+CLIENTS = ClientPool()
+HTTP_POOL = KeepAlivePool()
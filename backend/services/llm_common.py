@@ -0,0 +1,94 @@
+import os
+import json
+import time
+from .llm_cache import lookup as cache_lookup, store as cache_store
+from .compaction import compact_text
+from ..utils.email_parser import strip_html
+from . import rate_limit, streaming, metrics
+
+MAX_CHARS = int(os.environ.get("GEMINI_MAX_CHARS", "50000"))
+RETRIES = int(os.environ.get("GEMINI_RETRIES", "2"))
+TIMEOUT = int(os.environ.get("GEMINI_TIMEOUT", "60"))
+# 提示词变更时递增，使旧的缓存判定失效
+PROMPT_VERSION = "v1"
+
+PROMPT = (
+    "你是安全检测助手。对给定邮件正文进行钓鱼风险分析，输出 JSON：\n"
+    "{\n"
+    '  "semantic_consistency": 0-100,\n'
+    '  "style_anomaly": 0-100,\n'
+    '  "social_engineering": 0-100,\n'
+    '  "llm_generated_probability": 0-100,\n'
+    '  "evidence": "关键依据简述"\n'
+    "}。仅返回 JSON，不要解释。\n"
+)
+
+FIELDS = ["semantic_consistency", "style_anomaly", "social_engineering", "llm_generated_probability"]
+
+
+def safe_int(x, lo=0, hi=100):
+    try:
+        v = int(float(x))
+    except Exception:
+        v = 0
+    return max(lo, min(hi, v))
+
+
+def parse_json(text):
+    try:
+        return json.loads(text)
+    except Exception:
+        # try to extract first {...}
+        start = text.find("{")
+        end = text.rfind("}")
+        if start != -1 and end != -1 and end > start:
+            try:
+                return json.loads(text[start : end + 1])
+            except Exception:
+                pass
+    return {}
+
+
+def clean(text):
+    # 先压缩（去引用/签名/页脚并按显著性保留句子），再按字符上限截断
+    return compact_text(strip_html(text or ""))[:MAX_CHARS]
+
+
+def to_result(data):
+    if not data:
+        raise RuntimeError("LLM 响应解析失败，未返回有效 JSON")
+    res = {f: safe_int(data.get(f, 0)) for f in FIELDS}
+    res["evidence"] = data.get("evidence", "")
+    return res
+
+
+def analyze_text(config, text, complete, stream, timeout=TIMEOUT, cache_name=None, label="LLM"):
+    """
+    各提供方只提供传输调用：complete(config, system, user) 返回模型原始输出，
+    stream(config, system, user) 返回流式解析出的评分；缓存、限流与重试在这里统一处理。
+    """
+    truncated = clean(text)
+    cache_key, cached = cache_lookup(cache_name or config.provider, config.cache_model, PROMPT_VERSION, truncated)
+    if cached is not None:
+        return cached
+    limiter = rate_limit.get(config.provider, config)
+
+    def _call():
+        if streaming.ENABLED:
+            return stream(config, PROMPT, truncated)
+        return parse_json(complete(config, PROMPT, truncated))
+
+    last_err = None
+    for attempt in range(RETRIES + 1):
+        try:
+            result = to_result(limiter.run(_call, timeout))
+            cache_store(cache_key, result)
+            return result
+        except Exception as e:
+            last_err = e
+            if attempt >= RETRIES:
+                raise RuntimeError(f"{label} 调用失败: {last_err}")
+            metrics.LLM_RETRIES.inc(provider=config.provider)
+            # 限流由共享限流器统一暂停，其余错误按指数退避
+            if not rate_limit.is_throttle(e):
+                time.sleep(0.5 * (2 ** attempt))
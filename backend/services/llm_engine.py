@@ -0,0 +1,63 @@
+import os
+import threading
+import concurrent.futures
+
+MAX_INFLIGHT = int(os.environ.get("LLM_MAX_INFLIGHT", "32"))
+
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=MAX_INFLIGHT, thread_name_prefix="llm"
+)
+_LOCK = threading.Lock()
+_STATS = {"submitted": 0, "completed": 0, "timeouts": 0, "cancelled": 0, "abandoned": 0}
+
+
+class LLMTimeout(TimeoutError):
+    pass
+
+
+def _count(key):
+    with _LOCK:
+        _STATS[key] += 1
+
+
+def _on_done(fut):
+    if not fut.cancelled():
+        _count("completed")
+
+
+def _expire(fut, timeout):
+    _count("timeouts")
+    # 尚未开始执行的任务直接取消；已在执行的任务被放弃，调用方立即返回
+    if fut.cancel():
+        _count("cancelled")
+    else:
+        _count("abandoned")
+    return LLMTimeout(f"LLM 调用超时（{timeout}s）")
+
+
+def submit(fn, *args, **kwargs):
+    _count("submitted")
+    fut = _EXECUTOR.submit(fn, *args, **kwargs)
+    fut.add_done_callback(_on_done)
+    return fut
+
+
+def wait(fut, timeout):
+    """等待已提交的调用，超时后不等待其结束"""
+    try:
+        return fut.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        raise _expire(fut, timeout)
+
+
+def run(fn, timeout):
+    """在共享线程池中执行 fn，超时后不等待其结束"""
+    return wait(submit(fn), timeout)
+
+
+def stats():
+    with _LOCK:
+        out = dict(_STATS)
+    out["max_inflight"] = MAX_INFLIGHT
+    out["inflight"] = out["submitted"] - out["completed"] - out["cancelled"]
+    return out
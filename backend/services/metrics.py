@@ -0,0 +1,201 @@
+import os
+import time
+import bisect
+import itertools
+import threading
+from contextlib import contextmanager
+
+# 直方图分桶上界（秒），与 Prometheus 默认分桶一致
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SHARDS = int(os.environ.get("METRICS_SHARDS", "16"))
+
+# 线程首次写入时按轮转顺序领取分片号；线程 ident 是对齐的地址，不能直接取模
+_LOCAL = threading.local()
+_NEXT = itertools.count()
+
+
+def _thread_slot():
+    slot = getattr(_LOCAL, "slot", None)
+    if slot is None:
+        slot = _LOCAL.slot = next(_NEXT)
+    return slot
+
+
+class _Shards:
+    """
+    固定数量的分片，线程按首次写入顺序轮流落到其中一片，各片有独立的锁；
+    写入几乎不会与其他线程争用，读取时汇总所有分片。
+    """
+
+    def __init__(self, n=SHARDS):
+        self._shards = [(threading.Lock(), {}) for _ in range(max(1, n))]
+
+    def add(self, items):
+        lock, shard = self._shards[_thread_slot() % len(self._shards)]
+        with lock:
+            for k, v in items:
+                shard[k] = shard.get(k, 0) + v
+
+    def total(self):
+        out = {}
+        for lock, shard in self._shards:
+            with lock:
+                items = list(shard.items())
+            for k, v in items:
+                out[k] = out.get(k, 0) + v
+        return out
+
+
+def _labels_key(labelnames, labels):
+    return tuple(str(labels.get(n, "")) for n in labelnames)
+
+
+def _fmt_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _fmt_value(v):
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._shards = _Shards()
+
+    def inc(self, amount=1, **labels):
+        self._shards.add(((_labels_key(self.labelnames, labels), amount),))
+
+    def values(self):
+        return self._shards.total()
+
+    def render(self):
+        lines = []
+        for key, v in sorted(self.values().items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}")
+        return lines
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._shards = _Shards()
+
+    def observe(self, seconds, **labels):
+        key = _labels_key(self.labelnames, labels)
+        b = bisect.bisect_left(self.buckets, seconds)
+        self._shards.add((((key, "b", b), 1), ((key, "sum"), seconds), ((key, "count"), 1)))
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self):
+        totals = self._shards.total()
+        keys = sorted({k[0] for k in totals})
+        lines = []
+        for key in keys:
+            cum = 0
+            for i, bound in enumerate(self.buckets):
+                cum += totals.get((key, "b", i), 0)
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, [('le', bound)])} {cum}")
+            count = totals.get((key, "count"), 0)
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(float(totals.get((key, 'sum'), 0.0)))}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Gauge:
+    """抓取时调用 fn 取值；fn 可返回数值或 {标签值元组: 数值}"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        try:
+            v = self.fn()
+        except Exception:
+            return []
+        if isinstance(v, dict):
+            return [
+                f"{self.name}{_fmt_labels(self.labelnames, k if isinstance(k, tuple) else (k,))} {_fmt_value(val)}"
+                for k, val in sorted(v.items())
+            ]
+        return [f"{self.name} {_fmt_value(v)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, fn, labelnames=()):
+        with self._lock:
+            # 重复注册时以最新的取值函数为准
+            self._metrics[name] = Gauge(name, help_text, fn, labelnames)
+            return self._metrics[name]
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+UPLOADS = REGISTRY.counter("phish_uploads_total", "上传请求数", ["mode"])
+UPLOAD_FILES = REGISTRY.counter("phish_upload_files_total", "上传的邮件文件数", ["result"])
+EMAILS = REGISTRY.counter("phish_emails_processed_total", "分析完成的邮件数", ["status"])
+REPORTS_BY_LEVEL = REGISTRY.counter("phish_reports_total", "生成的报告数", ["level"])
+LLM_CALLS = REGISTRY.counter("phish_llm_calls_total", "LLM 调用次数", ["provider"])
+LLM_RETRIES = REGISTRY.counter("phish_llm_retries_total", "LLM 调用重试次数", ["provider"])
+LLM_FAILURES = REGISTRY.counter("phish_llm_failures_total", "LLM 调用失败次数", ["provider"])
+WHOIS_CACHE = REGISTRY.counter("phish_whois_cache_total", "WHOIS 缓存查询", ["result"])
+STORAGE_WRITE = REGISTRY.histogram("phish_storage_write_seconds", "报告存储写入耗时")
+
+
+def render():
+    return REGISTRY.render()
@@ -0,0 +1,62 @@
+import os
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+# 各提供方的环境变量与默认模型
+ENV = {
+    "gemini": ("GEMINI_API_KEY", "GEMINI_MODEL", "gemini-2.5-flash", None),
+    "glm46": ("GLM_API_KEY", "GLM_MODEL", "glm-4.6", None),
+    "custom": ("CUSTOM_API_KEY", "CUSTOM_MODEL", "gpt-4o-mini", "CUSTOM_BASE_URL"),
+}
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """
+    单次请求使用的提供方配置，创建后不可修改；
+    并发请求各自携带配置，互不覆盖。
+    """
+
+    provider: str
+    model: str
+    api_key: Optional[str] = field(default=None, repr=False)
+    base_url: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, provider):
+        key_env, model_env, default_model, url_env = ENV[provider]
+        return cls(
+            provider=provider,
+            model=os.environ.get(model_env) or default_model,
+            api_key=os.environ.get(key_env) or None,
+            base_url=(os.environ.get(url_env) or None) if url_env else None,
+        )
+
+    def with_overrides(self, model=None, api_key=None, base_url=None):
+        """请求头中的值覆盖环境默认值，返回新的配置"""
+        changes = {}
+        if model:
+            changes["model"] = model
+        if api_key:
+            changes["api_key"] = api_key
+        if base_url and self.provider == "custom":
+            changes["base_url"] = base_url
+        return replace(self, **changes) if changes else self
+
+    @property
+    def client_key(self):
+        return (self.provider, self.api_key, self.base_url)
+
+    @property
+    def cache_model(self):
+        """判定缓存键中的模型标识，自定义端点包含 base_url"""
+        if self.provider == "custom":
+            return (self.base_url or "").rstrip("/") + "|" + self.model
+        return self.model
+
+
+def resolve(provider, config=None):
+    """调用方未指定或指定了其他提供方的配置时，退回该提供方的环境配置"""
+    if config is not None and config.provider == provider:
+        return config
+    return ProviderConfig.from_env(provider)
@@ -0,0 +1,223 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from .llm_engine import LLMTimeout
+from . import llm_engine
+from .provider_config import ProviderConfig, resolve
+
+DEFAULT_RATE = float(os.environ.get("LLM_RATE", "10"))
+DEFAULT_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "16"))
+MIN_RATE = float(os.environ.get("LLM_MIN_RATE", "0.2"))
+RATE_STEP = float(os.environ.get("LLM_RATE_STEP", "0.05"))
+THROTTLE_PAUSE = float(os.environ.get("LLM_THROTTLE_PAUSE", "1.0"))
+# 限流器按凭据区分，租户自带密钥时条目数量需要有上限
+LIMITER_CACHE_SIZE = int(os.environ.get("LLM_LIMITERS", "256"))
+PROVIDERS = ("gemini", "glm46", "custom")
+
+# gRPC 风格的状态名（google-genai 的 APIError.status）
+THROTTLE_STATUSES = ("RESOURCE_EXHAUSTED",)
+
+
+def _statuses(err):
+    yield getattr(err, "status", None)
+    yield getattr(err, "status_code", None)
+    yield getattr(err, "code", None)
+    # httpx 等客户端把状态码放在附带的响应对象上
+    yield getattr(getattr(err, "response", None), "status_code", None)
+
+
+def is_throttle(err):
+    """按 HTTP 状态码或 SDK 错误的状态字段识别 429/配额耗尽，超时同样视为过载信号"""
+    if isinstance(err, LLMTimeout):
+        return True
+    for status in _statuses(err):
+        if status == 429 or status in THROTTLE_STATUSES:
+            return True
+    return False
+
+
+class AdaptiveLimiter:
+    """
+    令牌桶控制请求速率，AIMD 控制并发上限：
+    成功时速率与并发线性增长，遇到 429/超时减半并短暂全局暂停。
+    """
+
+    def __init__(self, name, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY):
+        self.name = name
+        self.max_rate = max(MIN_RATE, float(rate))
+        self.max_limit = max(1, int(concurrency))
+        self.rate = self.max_rate
+        self.limit = float(self.max_limit)
+        self.tokens = self.max_rate
+        self.inflight = 0
+        self.paused_until = 0.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.acquired = 0
+        self.waited = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.throttled = 0
+        self.decreases = 0
+
+    def _refill(self, now):
+        burst = max(1.0, self.rate)
+        self.tokens = min(burst, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _try_acquire(self):
+        """成功返回 0，否则返回建议等待的秒数"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.inflight >= int(self.limit):
+            return None
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.inflight += 1
+        self.acquired += 1
+        return 0
+
+    def acquire(self):
+        with self._cond:
+            wait = self._try_acquire()
+            if wait == 0:
+                return
+            self.waited += 1
+            while wait != 0:
+                # 并发已满时等待 release 唤醒，其余情况按令牌补充时间等待
+                self._cond.wait(wait)
+                wait = self._try_acquire()
+
+    def release(self, err=None):
+        with self._cond:
+            self.inflight = max(0, self.inflight - 1)
+            if err is None:
+                self.succeeded += 1
+                self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+                self.rate = min(self.max_rate, self.rate + RATE_STEP)
+            else:
+                self.failed += 1
+                if is_throttle(err):
+                    self._decrease()
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self._decrease()
+            self._cond.notify_all()
+
+    def _decrease(self):
+        self.throttled += 1
+        now = time.monotonic()
+        # 同一批并发请求同时返回 429 时只减半一次
+        if now - self._last_decrease < THROTTLE_PAUSE:
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.limit = max(1.0, self.limit / 2)
+        self.rate = max(MIN_RATE, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.paused_until = now + THROTTLE_PAUSE
+
+    def _release_done(self, fut):
+        self.release(LLMTimeout() if fut.cancelled() else fut.exception())
+
+    def submit(self, fn, *args):
+        """
+        取得名额后提交到 LLM 引擎，名额在调用真正结束时由完成回调归还；
+        超时被放弃但仍在执行的调用继续占用名额，不会让并发超出上限。
+        """
+        self.acquire()
+        try:
+            fut = llm_engine.submit(fn, *args)
+        except Exception as e:
+            self.release(e)
+            raise
+        fut.add_done_callback(self._release_done)
+        return fut
+
+    def run(self, fn, timeout):
+        fut = self.submit(fn)
+        try:
+            return llm_engine.wait(fut, timeout)
+        except LLMTimeout:
+            # 已在执行的调用无法取消，直接记为一次过载信号
+            if not fut.cancelled():
+                self.on_throttle()
+            raise
+
+    def stats(self):
+        with self._cond:
+            return {
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "concurrency_limit": int(self.limit),
+                "max_concurrency": self.max_limit,
+                "inflight": self.inflight,
+                "tokens": round(self.tokens, 3),
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "throttled": self.throttled,
+                "decreases": self.decreases,
+            }
+
+
+def _limiter(name):
+    key = name.upper()
+    return AdaptiveLimiter(
+        name,
+        rate=float(os.environ.get(f"LLM_RATE_{key}", DEFAULT_RATE)),
+        concurrency=int(os.environ.get(f"LLM_CONCURRENCY_{key}", DEFAULT_CONCURRENCY)),
+    )
+
+
+LIMITERS = OrderedDict()
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get(provider, config=None):
+    """
+    同一提供方的不同凭据各自计算配额，
+    某个租户的密钥被限流不会拖慢使用环境配置的请求。
+    """
+    key = resolve(provider, config).client_key
+    with _LIMITERS_LOCK:
+        lim = LIMITERS.get(key)
+        if lim is None:
+            lim = LIMITERS[key] = _limiter(provider)
+            while len(LIMITERS) > LIMITER_CACHE_SIZE:
+                LIMITERS.popitem(last=False)
+        else:
+            LIMITERS.move_to_end(key)
+        return lim
+
+
+def inflight():
+    """各提供方全部凭据进行中的请求数之和"""
+    out = dict.fromkeys(PROVIDERS, 0)
+    with _LIMITERS_LOCK:
+        limiters = list(LIMITERS.values())
+    for lim in limiters:
+        out[lim.name] += lim.stats()["inflight"]
+    return out
+
+
+def stats():
+    """各提供方环境配置的限流状态；租户凭据只给出数量，不暴露密钥"""
+    out = {name: get(name).stats() for name in PROVIDERS}
+    env = {ProviderConfig.from_env(name).client_key for name in PROVIDERS}
+    tenants = {}
+    with _LIMITERS_LOCK:
+        for key, lim in LIMITERS.items():
+            if key not in env:
+                tenants[lim.name] = tenants.get(lim.name, 0) + 1
+    out["tenant_credentials"] = tenants
+    return out
@@ -0,0 +1,187 @@
+import os
+import json
+import base64
+import bisect
+import threading
+
+PAGE_SIZE = int(os.environ.get("REPORTS_PAGE_SIZE", "100"))
+PAGE_MAX = int(os.environ.get("REPORTS_PAGE_MAX", "1000"))
+# 大于任何报告 id 的哨兵，用于按时间取右边界
+_MAX_ID = "\U0010ffff"
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """解析游标，格式不正确时抛出 ValueError"""
+    try:
+        ts, rid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("bad cursor")
+    if not isinstance(ts, str) or not isinstance(rid, str):
+        raise ValueError("bad cursor")
+    return ts, rid
+
+
+def _insort(keys, key):
+    # 新报告通常时间最新，直接追加；否则二分插入
+    if not keys or key >= keys[-1]:
+        keys.append(key)
+    else:
+        bisect.insort(keys, key)
+
+
+class TimeIndex:
+    """
+    按 (ts, id) 有序维护的主索引，外加按等级划分的二级索引；
+    分页时用二分定位游标与时间范围，只遍历返回所需的条目。
+    删除只登记墓碑，遍历时跳过；墓碑多于存活条目时整体压缩，摊还后单条删除 O(1)。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._by_level = {}
+        self._items = {}
+        self._dead = set()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _compact(self):
+        dead = self._dead
+        self._keys = [k for k in self._keys if k not in dead]
+        self._by_level = {lv: [k for k in keys if k not in dead] for lv, keys in self._by_level.items()}
+        self._by_level = {lv: keys for lv, keys in self._by_level.items() if keys}
+        self._dead = set()
+
+    def _remove(self, rid):
+        key, _, _ = self._items.pop(rid)
+        self._dead.add(key)
+        if len(self._dead) > max(64, len(self._items)):
+            self._compact()
+
+    def add(self, rid, ts, level, filename, item):
+        with self._lock:
+            if rid in self._items:
+                self._remove(rid)
+            key = (ts or "", rid)
+            if key in self._dead:
+                # 同一键重新写入前先清掉旧的墓碑，避免列表中出现重复键
+                self._compact()
+            _insort(self._keys, key)
+            _insort(self._by_level.setdefault(level, []), key)
+            self._items[rid] = (key, level, (filename or "", item))
+
+    def remove(self, rid):
+        with self._lock:
+            if rid in self._items:
+                self._remove(rid)
+                return True
+            return False
+
+    def select(self, level=None, since=None, until=None):
+        """时间范围（闭区间）内全部条目的 id，耗时与命中数成正比"""
+        with self._lock:
+            keys = self._by_level.get(level, []) if level else self._keys
+            lo = bisect.bisect_left(keys, (since, "")) if since else 0
+            hi = bisect.bisect_right(keys, (until, _MAX_ID)) if until else len(keys)
+            return [k[1] for k in keys[lo:hi] if k not in self._dead]
+
+    def page(self, limit=PAGE_SIZE, cursor=None, level=None, since=None, until=None, prefix=None, descending=True):
+        """返回 (条目列表, 下一页游标)；时间范围为闭区间，游标为上一页最后一条的 (ts, id)"""
+        limit = max(1, min(int(limit), PAGE_MAX))
+        with self._lock:
+            keys = self._by_level.get(level, []) if level else self._keys
+            lo = bisect.bisect_left(keys, (since, "")) if since else 0
+            hi = bisect.bisect_right(keys, (until, _MAX_ID)) if until else len(keys)
+            if cursor is not None:
+                if descending:
+                    hi = min(hi, bisect.bisect_left(keys, cursor))
+                else:
+                    lo = max(lo, bisect.bisect_right(keys, cursor))
+            order = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+            out = []
+            last = None
+            more = False
+            for i in order:
+                key = keys[i]
+                if key in self._dead:
+                    continue
+                filename, item = self._items[key[1]][2]
+                if prefix and not filename.startswith(prefix):
+                    continue
+                if len(out) == limit:
+                    more = True
+                    break
+                out.append(dict(item))
+                last = key
+        return out, (encode_cursor(last) if more else None)
+
+
+class HistoryLog:
+    """
+    按追加顺序保存的历史记录，可像列表一样 append/extend/遍历；
+    删除只登记 id，墓碑条目超过一半时整体压缩一次，摊还后单条删除 O(1)。
+    """
+
+    def __init__(self, items=()):
+        self._items = []
+        self._counts = {}
+        self._dead = set()
+        self._garbage = 0
+        self.extend(items)
+
+    def append(self, entry):
+        rid = entry.get("id")
+        if rid in self._dead:
+            self._compact()
+        self._items.append(entry)
+        self._counts[rid] = self._counts.get(rid, 0) + 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def discard(self, ids):
+        """删除这些 id 的全部记录，返回删除的条数"""
+        removed = 0
+        for rid in ids:
+            n = self._counts.get(rid, 0)
+            if n and rid not in self._dead:
+                self._dead.add(rid)
+                removed += n
+        self._garbage += removed
+        if self._garbage * 2 > len(self._items):
+            self._compact()
+        return removed
+
+    def _compact(self):
+        dead = self._dead
+        self._items = [h for h in self._items if h.get("id") not in dead]
+        for rid in dead:
+            self._counts.pop(rid, None)
+        self._dead = set()
+        self._garbage = 0
+
+    def tail(self, n):
+        """最近追加的 n 条记录（按追加顺序）"""
+        out = []
+        for h in reversed(self._items):
+            if len(out) >= n:
+                break
+            if h.get("id") not in self._dead:
+                out.append(h)
+        return out[::-1]
+
+    def __iter__(self):
+        dead = self._dead
+        return (h for h in list(self._items) if h.get("id") not in dead)
+
+    def __len__(self):
+        return len(self._items) - self._garbage
+
+    def __bool__(self):
+        return len(self) > 0
@@ -0,0 +1,276 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from . import metrics
+
+STORE_PATH = os.environ.get(
+    "REPORT_STORE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "data", "reports.sqlite3"),
+)
+BODY_CACHE_SIZE = int(os.environ.get("REPORT_CACHE_SIZE", "256"))
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS reports ("
+    " id TEXT PRIMARY KEY, filename TEXT, level TEXT, risk INTEGER, body TEXT,"
+    " ts TEXT, raw_digest TEXT, norm_digest TEXT, features TEXT)",
+    "CREATE TABLE IF NOT EXISTS history ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT, level TEXT, score INTEGER, filename TEXT, ts TEXT)",
+    "CREATE INDEX IF NOT EXISTS history_id ON history (id)",
+    "CREATE TABLE IF NOT EXISTS deleted (id TEXT PRIMARY KEY, meta TEXT)",
+)
+
+
+def _compact_features(report):
+    """统计汇总用到的少量特征，单独存一列"""
+    feats = report.get("features") or {}
+    rules = feats.get("rules") or {}
+    llm = feats.get("llm")
+    out = {"rules": {k: rules[k] for k in ("keyword", "url", "attachment") if k in rules}}
+    if isinstance(llm, dict) and llm:
+        out["llm"] = {k: llm.get(k, 0) for k in ("style_anomaly", "social_engineering", "llm_generated_probability")}
+    return json.dumps(out)
+
+
+class ReportStore:
+    """
+    报告持久化：SQLite WAL 模式，新增与删除各自只写相关的行并单独提交，
+    不再整体重写 storage.json；进程中途崩溃时最多丢失未提交的那一次写入。
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.writes = 0
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL 下 NORMAL 不会损坏数据库，只在断电时可能丢失最后一次提交
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+            # 摘要、去重与统计所需的字段单独成列，启动时无需解析报告正文；旧库补列并回填一次
+            cols = {row[1] for row in conn.execute("PRAGMA table_info(reports)")}
+            if "features" not in cols:
+                for col in ("ts", "raw_digest", "norm_digest", "features"):
+                    if col not in cols:
+                        conn.execute(f"ALTER TABLE reports ADD COLUMN {col} TEXT")
+                for rid, body in conn.execute("SELECT id, body FROM reports").fetchall():
+                    rep = json.loads(body)
+                    digest = rep.get("digest") or {}
+                    conn.execute(
+                        "UPDATE reports SET raw_digest = ?, norm_digest = ?, features = ? WHERE id = ?",
+                        (digest.get("raw"), digest.get("normalized"), _compact_features(rep), rid),
+                    )
+                self._backfill_ts(conn)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _write(self, fn):
+        with self._lock, metrics.STORAGE_WRITE.time():
+            db = self._db()
+            try:
+                fn(db)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            self.writes += 1
+
+    @staticmethod
+    def _backfill_ts(db):
+        db.execute(
+            "UPDATE reports SET ts = (SELECT h.ts FROM history h WHERE h.id = reports.id) WHERE ts IS NULL"
+        )
+
+    @staticmethod
+    def _put(db, report, entry=None):
+        digest = report.get("digest") or {}
+        db.execute(
+            "INSERT OR REPLACE INTO reports"
+            " (id, filename, level, risk, ts, raw_digest, norm_digest, features, body)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                report["id"],
+                report.get("filename"),
+                report.get("level"),
+                report.get("risk"),
+                entry.get("ts") if entry else None,
+                digest.get("raw"),
+                digest.get("normalized"),
+                _compact_features(report),
+                json.dumps(report, ensure_ascii=False),
+            ),
+        )
+        if entry is not None:
+            db.execute(
+                "INSERT INTO history (id, level, score, filename, ts) VALUES (?, ?, ?, ?, ?)",
+                (entry["id"], entry.get("level"), entry.get("score"), entry.get("filename"), entry.get("ts")),
+            )
+
+    def append(self, report, entry=None):
+        """保存一份报告及其历史记录（失败的报告没有历史记录）"""
+        self._write(lambda db: self._put(db, report, entry))
+
+    def delete_many(self, metas):
+        """批量删除报告并登记墓碑，{id: 删除信息}，整批只提交一次"""
+        ids = [(rid,) for rid in metas]
+
+        def run(db):
+            db.executemany("DELETE FROM reports WHERE id = ?", ids)
+            db.executemany("DELETE FROM history WHERE id = ?", ids)
+            db.executemany(
+                "INSERT OR REPLACE INTO deleted (id, meta) VALUES (?, ?)",
+                [(rid, json.dumps(meta, ensure_ascii=False)) for rid, meta in metas.items()],
+            )
+
+        self._write(run)
+
+    def purge_tombstones(self, ids):
+        """清除过了保留期的墓碑"""
+        self._write(lambda db: db.executemany("DELETE FROM deleted WHERE id = ?", [(rid,) for rid in ids]))
+
+    def digests(self, ids):
+        """按 id 读取去重摘要，不解析报告正文"""
+        out = {}
+        ids = list(ids)
+        with self._lock:
+            db = self._db()
+            # SQLite 对单条语句的参数个数有上限，分段查询
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = db.execute(
+                    "SELECT id, raw_digest, norm_digest FROM reports WHERE id IN (%s)" % ",".join("?" * len(chunk)),
+                    chunk,
+                )
+                for rid, raw, norm in rows:
+                    out[rid] = {k: v for k, v in (("raw", raw), ("normalized", norm)) if v}
+        return out
+
+    def empty(self):
+        with self._lock:
+            db = self._db()
+            return not any(
+                db.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone() for t in ("reports", "history", "deleted")
+            )
+
+    def migrate(self, json_path):
+        """把旧版 storage.json 一次性导入数据库，成功后改名保留原文件"""
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        meta = data.get("deleted_meta") if isinstance(data.get("deleted_meta"), dict) else {}
+
+        def run(db):
+            for rep in (data.get("reports") or {}).values():
+                self._put(db, rep)
+            for h in data.get("history") or []:
+                db.execute(
+                    "INSERT INTO history (id, level, score, filename, ts) VALUES (?, ?, ?, ?, ?)",
+                    (h.get("id"), h.get("level"), h.get("score"), h.get("filename"), h.get("ts")),
+                )
+            for rid in set(data.get("deleted_ids") or []) | set(meta):
+                db.execute(
+                    "INSERT OR REPLACE INTO deleted (id, meta) VALUES (?, ?)",
+                    (rid, json.dumps(meta.get(rid) or {}, ensure_ascii=False)),
+                )
+            self._backfill_ts(db)
+
+        self._write(run)
+        os.replace(json_path, json_path + ".migrated")
+
+    def get(self, report_id):
+        """读取单份报告的完整正文，不存在时返回 None"""
+        with self._lock:
+            row = self._db().execute("SELECT body FROM reports WHERE id = ?", (report_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load(self):
+        """
+        返回 (摘要行, 去重摘要, 统计特征, 历史列表, 删除记录)；只读取列，不解析报告正文。
+        去重摘要为 {id: {"raw": ..., "normalized": ...}}，统计特征为 {id: {"rules": ..., "llm": ...}}。
+        """
+        with self._lock:
+            db = self._db()
+            reports = {}
+            digests = {}
+            features = {}
+            for rid, filename, level, risk, ts, raw, norm, feats in db.execute(
+                "SELECT id, filename, level, risk, ts, raw_digest, norm_digest, features FROM reports"
+            ):
+                reports[rid] = {"id": rid, "filename": filename, "risk": risk, "level": level, "ts": ts}
+                digests[rid] = {k: v for k, v in (("raw", raw), ("normalized", norm)) if v}
+                features[rid] = json.loads(feats) if feats else {}
+            history = [
+                {"id": rid, "level": level, "score": score, "filename": filename, "ts": ts}
+                for rid, level, score, filename, ts in db.execute(
+                    "SELECT id, level, score, filename, ts FROM history ORDER BY seq"
+                )
+            ]
+            deleted = {rid: json.loads(meta) for rid, meta in db.execute("SELECT id, meta FROM deleted ORDER BY rowid")}
+        return reports, digests, features, history, deleted
+
+    def stats(self):
+        with self._lock:
+            db = self._db()
+            counts = {
+                t: db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("reports", "history", "deleted")
+            }
+        return {"path": os.path.abspath(self.path), "writes": self.writes, **counts}
+
+
+class BodyCache:
+    """报告正文的有界 LRU，未命中时从存储读取"""
+
+    def __init__(self, store, capacity=BODY_CACHE_SIZE):
+        self.store = store
+        self.capacity = max(1, int(capacity))
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, report):
+        with self._lock:
+            self._lru[report["id"]] = report
+            self._lru.move_to_end(report["id"])
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def get(self, report_id):
+        with self._lock:
+            body = self._lru.get(report_id)
+            if body is not None:
+                self._lru.move_to_end(report_id)
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = self.store.get(report_id)
+        if body is not None:
+            self.put(body)
+        return body
+
+    def discard(self, report_id):
+        with self._lock:
+            self._lru.pop(report_id, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._lru),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+STORE = ReportStore()
+BODIES = BodyCache(STORE)
@@ -0,0 +1,285 @@
+import os
+import time
+import threading
+import concurrent.futures
+from collections import deque, OrderedDict
+from . import gemini_llm, glm_llm, custom_llm
+from .latency import LATENCY
+from .provider_config import ProviderConfig, resolve
+from . import metrics, llm_cache
+
+HEDGE = os.environ.get("LLM_HEDGE", "1") == "1"
+HEDGE_DELAY = float(os.environ.get("LLM_HEDGE_DELAY", "10"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+CB_FAILURES = int(os.environ.get("LLM_CB_FAILURES", "3"))
+CB_COOLDOWN = float(os.environ.get("LLM_CB_COOLDOWN", "60"))
+ROUTER_WORKERS = int(os.environ.get("LLM_ROUTER_WORKERS", "32"))
+# 熔断状态按凭据区分，租户自带密钥时条目数量需要有上限
+STATE_CACHE_SIZE = int(os.environ.get("LLM_ROUTER_STATES", "256"))
+
+class BreakerOpen(RuntimeError):
+    """全部候选提供方都处于熔断中，未发出任何请求"""
+
+
+# 候选顺序：首选提供方之后按此顺序尝试其他已配置的提供方
+FALLBACK_ORDER = ["gemini", "glm46", "custom"]
+
+_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=ROUTER_WORKERS, thread_name_prefix="llm-router"
+)
+
+
+PROVIDERS = {
+    "gemini": (gemini_llm, gemini_llm.ensure_ready),
+    "glm46": (glm_llm, glm_llm.ensure_ready),
+    "custom": (custom_llm, custom_llm.ensure_ready),
+}
+
+
+class ProviderState:
+    """单个提供方的延迟窗口与熔断状态"""
+
+    def __init__(self, name, window=200):
+        self.name = name
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < CB_COOLDOWN:
+                return False
+            # 冷却结束进入半开状态，仅放行一个探测请求
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def release(self):
+        # 未产生真实请求（如缓存命中）时归还半开探测名额
+        with self._lock:
+            self.probing = False
+
+    def record(self, ok, elapsed):
+        with self._lock:
+            self.calls += 1
+            self.probing = False
+            if ok:
+                self.latencies.append(elapsed)
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.errors += 1
+                self.failures += 1
+                if self.failures >= CB_FAILURES:
+                    self.opened_at = time.monotonic()
+
+    def percentile(self, q):
+        with self._lock:
+            data = sorted(self.latencies)
+        if not data:
+            return None
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+    def note_hedge(self, won=False):
+        with self._lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedges += 1
+
+    def hedge_delay(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DELAY
+        return self.percentile(0.95)
+
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at < CB_COOLDOWN:
+                return "open"
+            return "half_open"
+
+    def stats(self):
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        state = self.state()
+        with self._lock:
+            return {
+                "state": state,
+                "calls": self.calls,
+                "errors": self.errors,
+                "consecutive_failures": self.failures,
+                "samples": len(self.latencies),
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p95": round(p95, 3) if p95 is not None else None,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
+
+
+# (provider, api_key, base_url) -> ProviderState，按最近使用顺序淘汰
+STATES = OrderedDict()
+_STATES_LOCK = threading.Lock()
+
+
+def _state(name, config=None):
+    """
+    同一提供方的不同凭据各自维护延迟窗口与熔断状态，
+    某个租户的密钥失效不会熔断使用环境配置的请求。
+    """
+    key = resolve(name, config).client_key
+    with _STATES_LOCK:
+        st = STATES.get(key)
+        if st is None:
+            st = STATES[key] = ProviderState(name)
+            while len(STATES) > STATE_CACHE_SIZE:
+                STATES.popitem(last=False)
+        else:
+            STATES.move_to_end(key)
+        return st
+
+
+def _own_credentials(config):
+    """请求是否带有与环境配置不同的密钥或端点"""
+    return config is not None and config.client_key != ProviderConfig.from_env(config.provider).client_key
+
+
+def _configured(name):
+    try:
+        PROVIDERS[name][1]()
+        return True
+    except Exception:
+        return False
+
+
+def _call(name, text, config=None):
+    module = PROVIDERS[name][0]
+    state = _state(name, config)
+    llm_cache.reset_hit()
+    t0 = time.monotonic()
+    try:
+        # 配置只属于其对应的提供方，降级到其他提供方时使用各自的环境配置
+        res = module.analyze_text(text, config if config is not None and config.provider == name else None)
+    except Exception:
+        state.record(False, time.monotonic() - t0)
+        metrics.LLM_CALLS.inc(provider=name)
+        metrics.LLM_FAILURES.inc(provider=name)
+        raise
+    if llm_cache.last_hit():
+        # 判定缓存命中不是提供方往返，不计入延迟窗口（对冲阈值）、熔断状态与调用指标
+        state.release()
+        return res
+    metrics.LLM_CALLS.inc(provider=name)
+    elapsed = time.monotonic() - t0
+    state.record(True, elapsed)
+    LATENCY.record("llm", elapsed)
+    LATENCY.record("llm", elapsed, provider=name)
+    return res
+
+
+def candidates(primary, config=None):
+    # 请求自带凭据时只使用该凭据，不降级或对冲到环境配置的其他提供方
+    if _own_credentials(config):
+        return [primary]
+    return [primary] + [p for p in FALLBACK_ORDER if p != primary and _configured(p)]
+
+
+def analyze_batch(texts, primary="gemini", config=None):
+    """
+    打包分析只发往首选提供方，不对冲也不降级；熔断中或请求全部失败时整批留空，
+    由单封流程经 analyze 路由。失败计入该提供方的熔断状态。
+    """
+    if primary not in PROVIDERS:
+        primary = "gemini"
+    state = _state(primary, config)
+    if not state.allow():
+        return [None] * len(texts)
+    module = PROVIDERS[primary][0]
+    t0 = time.monotonic()
+    try:
+        out = module.analyze_batch(texts, config if config is not None and config.provider == primary else None)
+    except Exception:
+        state.record(False, time.monotonic() - t0)
+        return [None] * len(texts)
+    # 打包请求的耗时不代表单封延迟，不计入对冲阈值的延迟窗口；成功也不关闭半开的熔断，由单封探测决定
+    state.release()
+    return out
+
+
+def analyze(text, primary="gemini", config=None):
+    """
+    首选提供方超过其 p95 延迟仍未返回时，向下一个可用提供方发送对冲请求，
+    取最先成功的结果；失败时依次降级，熔断中的提供方被跳过。
+    请求自带密钥或端点时只调用首选提供方。全部熔断时立即抛出 BreakerOpen。
+    """
+    if primary not in PROVIDERS:
+        primary = "gemini"
+    queue = candidates(primary, config)
+    inflight = {}
+    launched = []
+    last_err = None
+
+    def _launch(hedged=False):
+        while queue:
+            name = queue.pop(0)
+            if not _state(name, config).allow():
+                continue
+            if hedged:
+                _state(name, config).note_hedge()
+            inflight[_POOL.submit(_call, name, text, config)] = (name, hedged)
+            launched.append(name)
+            return True
+        return False
+
+    if not _launch():
+        # 全部熔断时直接失败，不再向故障提供方发送请求，冷却结束后由半开探测恢复
+        raise BreakerOpen("LLM 提供方熔断中：" + "、".join(candidates(primary, config)))
+    while inflight:
+        wait_for = None
+        if HEDGE and queue:
+            oldest = next(iter(inflight.values()))[0]
+            wait_for = _state(oldest, config).hedge_delay()
+        done, _ = concurrent.futures.wait(
+            list(inflight), timeout=wait_for, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        if not done:
+            _launch(hedged=True)
+            continue
+        for fut in done:
+            name, hedged = inflight.pop(fut)
+            try:
+                res = fut.result()
+            except Exception as e:
+                last_err = e
+                continue
+            if hedged:
+                _state(name, config).note_hedge(won=True)
+            res = dict(res)
+            res["provider"] = name
+            return res
+        # 有请求失败时立即降级到下一个提供方
+        _launch()
+    raise last_err or RuntimeError("无可用的 LLM 提供方")
+
+
+def stats():
+    """各提供方环境配置的状态；租户凭据只给出数量，不暴露密钥"""
+    out = {name: _state(name).stats() for name in PROVIDERS}
+    env = {ProviderConfig.from_env(name).client_key for name in PROVIDERS}
+    tenants = {}
+    with _STATES_LOCK:
+        for key, st in STATES.items():
+            if key not in env:
+                tenants[st.name] = tenants.get(st.name, 0) + 1
+    out["tenant_credentials"] = tenants
+    return out
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+from .llm_engine import LLMTimeout
+
+ENABLED = os.environ.get("LLM_STREAM", "1") == "1"
+# 从发出请求到拿到完整评分的时间预算（秒）
+TTFS_BUDGET = float(os.environ.get("LLM_STREAM_TTFS", "30"))
+
+REQUIRED = (
+    "semantic_consistency",
+    "style_anomaly",
+    "social_engineering",
+    "llm_generated_probability",
+    "evidence",
+)
+
+
+class IncrementalJSON:
+    """
+    逐块接收模型输出，跟踪第一个顶层 JSON 对象；
+    每当一个顶层字段的值结束就尝试解析，字段齐全即视为完成。
+    """
+
+    def __init__(self, required=REQUIRED):
+        self.required = required
+        self.buf = []
+        self.size = 0
+        self.start = -1
+        self.depth = 0
+        self.in_str = False
+        self.escape = False
+        self.in_value = False
+        self.data = None
+
+    @property
+    def done(self):
+        return self.data is not None
+
+    @property
+    def text(self):
+        return "".join(self.buf)
+
+    def _try(self, upto, close=True):
+        obj = self.text[self.start : upto]
+        try:
+            data = json.loads(obj + "}" if close else obj)
+        except Exception:
+            return
+        if isinstance(data, dict) and all(k in data for k in self.required):
+            self.data = data
+
+    def feed(self, chunk):
+        if self.done or not chunk:
+            return self.done
+        offset = self.size
+        self.buf.append(chunk)
+        self.size += len(chunk)
+        for i, ch in enumerate(chunk, offset):
+            if self.in_str:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_str = False
+                    if self.depth == 1 and self.in_value:
+                        self.in_value = False
+                        self._try(i + 1)
+                continue
+            if ch == '"':
+                self.in_str = True
+            elif ch in "{[":
+                if self.depth == 0 and ch == "{":
+                    self.start = i
+                if self.start >= 0:
+                    self.depth += 1
+            elif ch in "}]" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    self._try(i + 1, close=False)
+                    if not self.done:
+                        # 不完整的对象（如示例片段），继续寻找下一个
+                        self.start = -1
+                        self.in_value = False
+            elif self.depth == 1 and ch == ":":
+                self.in_value = True
+            elif self.depth == 1 and ch == ",":
+                if self.in_value:
+                    self.in_value = False
+                    self._try(i)
+            if self.done:
+                return True
+        return self.done
+
+    def result(self):
+        if self.data is not None:
+            return self.data
+        # 流结束仍未凑齐字段时退回整段解析
+        text = self.text
+        try:
+            return json.loads(text)
+        except Exception:
+            start = text.find("{")
+            end = text.rfind("}")
+            if start != -1 and end > start:
+                try:
+                    return json.loads(text[start : end + 1])
+                except Exception:
+                    pass
+        return {}
+
+
+def _close(stream):
+    close = getattr(stream, "close", None)
+    if close is None:
+        close = getattr(getattr(stream, "response", None), "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+def consume(stream, pieces, budget=TTFS_BUDGET):
+    """
+    pieces(stream) 逐块产出文本；评分字段齐全后立即关闭流，
+    不再等待模型生成后续的解释文字。超出时间预算抛出 LLMTimeout。
+    """
+    parser = IncrementalJSON()
+    t0 = time.monotonic()
+    try:
+        for chunk in pieces(stream):
+            if parser.feed(chunk):
+                break
+            if time.monotonic() - t0 > budget:
+                raise LLMTimeout(f"流式评分超出时间预算（{budget}s）")
+    finally:
+        _close(stream)
+    return parser.result()
+
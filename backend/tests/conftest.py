@@ -0,0 +1,10 @@
+import os
+import atexit
+import shutil
+import tempfile
+
+# 测试不写源码目录下的 backend/data：报告库与判定缓存放到临时目录，须在导入 backend 之前设置
+_DATA_DIR = tempfile.mkdtemp(prefix="phish-tests-")
+atexit.register(shutil.rmtree, _DATA_DIR, True)
+os.environ["REPORT_STORE_PATH"] = os.path.join(_DATA_DIR, "reports.sqlite3")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_DATA_DIR, "llm_cache.sqlite3")
@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+import random
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.aggregates import Aggregates
+from backend.services.report_index import TimeIndex
+from backend import app as app_module
+
+
+def _full_scan(history, reports):
+    """原实现：每次遍历全部历史记录"""
+    total = len(history)
+    levels = {"低": 0, "中": 0, "高": 0, "危急": 0}
+    hist = [0] * 10
+    daily = {}
+    risk = 0.0
+    feat = {"keyword": 0.0, "url": 0.0, "attachment": 0.0}
+    llm_avg = {"style_anomaly": 0.0, "social_engineering": 0.0, "llm_generated_probability": 0.0}
+    llm_count = 0
+    for h in history:
+        levels[h["level"]] = levels.get(h["level"], 0) + 1
+        s = int(h["score"])
+        hist[min(9, max(0, s // 10))] += 1
+        daily[h["ts"][:10]] = daily.get(h["ts"][:10], 0) + 1
+        risk += s
+        rep = reports.get(h["id"])
+        if rep:
+            for k in feat:
+                feat[k] += float(rep["features"]["rules"].get(k, 0))
+            llm = rep["features"].get("llm", {})
+            if llm:
+                llm_count += 1
+                for k in llm_avg:
+                    llm_avg[k] += float(llm.get(k, 0))
+    if llm_count:
+        llm_avg = {k: round(v / llm_count, 2) for k, v in llm_avg.items()}
+    llm_avg["available_ratio"] = round((llm_count / total) if total else 0.0, 2)
+    return {
+        "total": total,
+        "levels": levels,
+        "avg": {"risk": round(risk / total, 2) if total else 0.0},
+        "risk_histogram": {"bins": [f"{i*10}-{(i+1)*10}" for i in range(10)], "counts": hist},
+        "daily": sorted([{"date": d, "count": c} for d, c in daily.items()], key=lambda x: x["date"]),
+        "features_avg": {k: round(v / total, 2) if total else 0.0 for k, v in feat.items()},
+        "llm_avg": llm_avg,
+    }
+
+
+class TestAggregates(unittest.TestCase):
+    def test_matches_full_scan_after_inserts_and_deletes(self):
+        rnd = random.Random(5)
+        agg = Aggregates()
+        history, reports = [], {}
+        for i in range(300):
+            rid = "r%d" % i
+            score = rnd.randint(0, 100)
+            entry = {"id": rid, "level": rnd.choice(["低", "中", "高", "危急"]), "score": score,
+                     "filename": rid, "ts": "2026-03-%02dT10:00:00" % rnd.randint(1, 28)}
+            report = {"features": {
+                "rules": {"keyword": rnd.randint(0, 100), "url": rnd.randint(0, 100), "attachment": 0},
+                "llm": {"style_anomaly": rnd.randint(0, 100), "social_engineering": 3} if rnd.random() < 0.7 else {},
+            }}
+            history.append(entry)
+            reports[rid] = report
+            agg.add(entry, report)
+            if rnd.random() < 0.3:
+                gone = history.pop(rnd.randrange(len(history)))
+                del reports[gone["id"]]
+                self.assertTrue(agg.remove(gone["id"]))
+        self.assertEqual(agg.snapshot(), _full_scan(history, reports))
+        for h in list(history):
+            agg.remove(h["id"])
+        self.assertEqual(agg.snapshot(), _full_scan([], {}))
+
+    def test_alerts_endpoint_reads_the_alert_index(self):
+        index = TimeIndex()
+        index.add("a", "2026-01-02", "危急", "a.eml", {"id": "a", "level": "危急"})
+        with mock.patch.object(app_module, "ALERT_INDEX", index):
+            data = app_module.app.test_client().get("/api/alerts").get_json()
+        self.assertEqual([x["id"] for x in data["items"]], ["a"])
+
+
+if __name__ == '__main__':
+    unittest.main()
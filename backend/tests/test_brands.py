@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import json
+import random
+import tempfile
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.detectors import brands
+from backend.benchmarks import brand_lookup
+from backend.utils.domain import embedding_similarity
+
+
+def _linear(data, dom, text_all):
+    """原实现：逐品牌逐域计算相似度"""
+    brand_hit, brand_dom_hit, score_sim = None, None, 0.0
+    for b in data:
+        name = b.get("name") or ""
+        cond = (name.lower() in text_all.lower()) or (dom and name.lower() in dom.lower())
+        for bd in b.get("domains") or []:
+            s = embedding_similarity(dom or bd, bd)
+            if s > score_sim and (cond or s >= 0.6):
+                score_sim, brand_hit, brand_dom_hit = s, name, bd
+    return brand_hit, brand_dom_hit, score_sim
+
+
+class TestBrandIndex(unittest.TestCase):
+    def test_matches_linear_scan(self):
+        with open(brands.BRANDS_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = brands.BrandIndex()
+        cases = [
+            ("paypa1-secure.com", "please login"),
+            ("", "Your Apple ID is locked"),
+            ("micros0ft.com", ""),
+            ("example.org", "招商银行 通知"),
+            ("", "hello"),
+        ]
+        for dom, text in cases:
+            self.assertEqual(index.match(dom, text), _linear(data, dom, text))
+
+    def test_inverted_index_agrees_on_large_list(self):
+        data = brand_lookup.synthetic_brands(600)
+        index = brands.CompiledBrands(data)
+        rnd = random.Random(1)
+        for _ in range(30):
+            b = rnd.choice(data)
+            dom = brand_lookup.lookalike(rnd.choice(b["domains"]), rnd)
+            text = rnd.choice(["", "from " + b["name"], "hello"])
+            self.assertEqual(index.match(dom, text), _linear(data, dom, text))
+
+    def test_reloads_when_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "brands.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump([{"name": "Acme", "domains": ["acme.com"]}], f)
+            with mock.patch.object(brands, "CHECK_INTERVAL", 0):
+                index = brands.BrandIndex(path)
+                self.assertEqual(index.match("acme.com", "")[0], "Acme")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump([{"name": "Globex", "domains": ["globex.com"]}], f)
+                os.utime(path, (0, 12345))
+                self.assertEqual(index.match("globex.com", "")[0], "Globex")
+                reloads = index.reloads
+                index.match("globex.com", "")
+                self.assertEqual(index.reloads, reloads)
+
+
+if __name__ == '__main__':
+    unittest.main()
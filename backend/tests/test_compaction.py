@@ -0,0 +1,148 @@
+import unittest
+import sys
+import os
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import compaction
+from backend.services.llm_batch import estimate_tokens
+
+GMAIL_REPLY = """Thanks, see you on Friday.
+
+On Mon, Mar 4, 2024 at 9:12 AM Alice Wang <alice@example.com> wrote:
+> Are we still meeting this week?
+> Let me know.
+"""
+
+GMAIL_FORWARD = """FYI, is this legit?
+
+---------- Forwarded message ---------
+From: IT Support <support@examp1e-security.com>
+Date: Tue, Mar 5, 2024 at 8:01 AM
+Subject: Mailbox quota exceeded
+To: <bob@example.com>
+
+Your mailbox is full. Verify your password at http://examp1e-security.com/login within 24 hours.
+"""
+
+OUTLOOK_FORWARD = """Please check the invoice below.
+
+________________________________
+From: Accounts <billing@vendor-pay.net>
+Sent: Tuesday, March 5, 2024 10:20 AM
+Subject: FW: Overdue invoice 4471
+To: Finance
+
+Wire the payment to the new bank account today.
+"""
+
+OUTLOOK_REPLY = """Approved.
+
+-----Original Message-----
+From: Carol
+Sent: Monday, March 4, 2024 5:00 PM
+Subject: RE: Budget
+
+Can you approve the Q2 budget?
+"""
+
+CHINESE_REPLY = """好的，收到。
+
+在 2024年3月4日 周一 09:12，张三 <zhang@example.com> 写道：
+> 请确认周五的会议安排。
+"""
+
+SIGNED = """Hi team, the release is on track.
+--
+Bob Li
+Engineering Manager
+Tel: 123-456
+"""
+
+FOOTER = """Your order has shipped.
+To unsubscribe from these emails, use the link in your profile.
+Copyright 2024 Shop Inc. All rights reserved.
+Unsubscribe and verify your password at http://evil.example/x
+"""
+
+
+class TestStripNoise(unittest.TestCase):
+    def test_reply_history_is_separated(self):
+        body, history = compaction.split_noise(GMAIL_REPLY)
+        self.assertEqual(body, "Thanks, see you on Friday.")
+        self.assertIn("Are we still meeting this week?", history)
+        self.assertNotIn("wrote:", body + history)
+        self.assertNotIn(">", history)
+
+        body, history = compaction.split_noise(CHINESE_REPLY)
+        self.assertEqual(body, "好的，收到。")
+        self.assertIn("请确认周五的会议安排。", history)
+
+        body, history = compaction.split_noise(OUTLOOK_REPLY)
+        self.assertEqual(body, "Approved.")
+        self.assertIn("Can you approve the Q2 budget?", history)
+
+    def test_forwarded_body_is_kept(self):
+        body, history = compaction.split_noise(GMAIL_FORWARD)
+        self.assertEqual(history, "")
+        self.assertIn("FYI, is this legit?", body)
+        self.assertIn("support@examp1e-security.com", body)
+        self.assertIn("http://examp1e-security.com/login", body)
+
+        body, history = compaction.split_noise(OUTLOOK_FORWARD)
+        self.assertEqual(history, "")
+        self.assertIn("Subject: FW: Overdue invoice 4471", body)
+        self.assertIn("Wire the payment to the new bank account today.", body)
+
+    def test_signature_is_cut_per_segment(self):
+        self.assertEqual(compaction.strip_noise(SIGNED), "Hi team, the release is on track.")
+        # 转发者的签名只截断其所在的一段，被转发的原文保留
+        text = "FYI\n--\nBob\n" + GMAIL_FORWARD.split("\n", 2)[2]
+        body, _ = compaction.split_noise(text)
+        self.assertNotIn("Bob", body)
+        self.assertIn("Verify your password", body)
+
+    def test_footer_lines_without_keywords_are_dropped(self):
+        out = compaction.strip_noise(FOOTER)
+        self.assertIn("Your order has shipped.", out)
+        self.assertNotIn("Copyright", out)
+        self.assertNotIn("To unsubscribe", out)
+        # 含可疑关键词的页脚行可能是伪装的钓鱼内容，保留
+        self.assertIn("http://evil.example/x", out)
+
+
+class TestCompactText(unittest.TestCase):
+    def test_short_text_keeps_history(self):
+        self.assertEqual(
+            compaction.compact_text(GMAIL_REPLY),
+            "Thanks, see you on Friday.\n\nAre we still meeting this week?\nLet me know.",
+        )
+
+    def test_salient_sentences_survive_budget(self):
+        filler = " ".join("We hope you enjoyed our spring catalogue number %d." % i for i in range(300))
+        text = (
+            "Dear customer,\n" + filler + "\n"
+            "Your account will be suspended, verify your password at http://evil.example/login now.\n"
+            + filler
+        )
+        out = compaction.compact_text(text, budget=200)
+        self.assertLessEqual(estimate_tokens(out), 200 + 20)
+        self.assertTrue(out.startswith("Dear customer,"))
+        self.assertIn("http://evil.example/login", out)
+        self.assertIn("…", out)
+
+    def test_forwarded_payload_outranks_reply_history(self):
+        history = "\n".join("> Meeting notes line %d about the roadmap." % i for i in range(200))
+        text = GMAIL_FORWARD + "\nOn Mon, Mar 4, 2024 Alice wrote:\n" + history
+        out = compaction.compact_text(text, budget=120)
+        self.assertIn("http://examp1e-security.com/login", out)
+        self.assertNotIn("line 199", out)
+
+    def test_salience_weights(self):
+        self.assertEqual(compaction.salience("see you soon"), 0)
+        self.assertGreater(compaction.salience("click here http://x.example"), compaction.salience("invoice attached"))
+
+
+if __name__ == '__main__':
+    unittest.main()
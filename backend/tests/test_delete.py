@@ -0,0 +1,172 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+import threading
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import app as app_module
+from backend.services.report_index import TimeIndex, HistoryLog
+from backend.services.report_store import ReportStore, BodyCache
+from backend.services.aggregates import Aggregates
+from backend.detectors import batch as batch_module
+
+
+def _risk(level):
+    def fake(parsed, model="gemini", **kwargs):
+        return {
+            "score": {"低": 10, "高": 70}[level],
+            "confidence": 0.5,
+            "level": level,
+            "features": {"rules": {"keyword": 0, "url": 0, "attachment": 0}},
+            "summary": "",
+            "threats": [],
+            "chain": [],
+        }
+
+    return fake
+
+
+class TestIndexTombstones(unittest.TestCase):
+    def test_history_log_discard_and_compaction(self):
+        log = HistoryLog({"id": "h%d" % i} for i in range(10))
+        self.assertEqual(log.discard(["h1", "h3", "nope"]), 2)
+        self.assertEqual(len(log), 8)
+        self.assertEqual([h["id"] for h in log.tail(3)], ["h7", "h8", "h9"])
+        self.assertEqual(log.discard(["h%d" % i for i in range(4, 10)]), 6)
+        self.assertEqual([h["id"] for h in log], ["h0", "h2"])
+        log.append({"id": "h1"})
+        self.assertEqual([h["id"] for h in log], ["h0", "h2", "h1"])
+
+    def test_time_index_skips_and_compacts_removed_keys(self):
+        index = TimeIndex()
+        for i in range(200):
+            index.add("r%d" % i, "2026-01-01T%05d" % i, "低" if i % 2 else "高", "f", {"id": "r%d" % i})
+        for i in range(0, 150):
+            index.remove("r%d" % i)
+        self.assertEqual(len(index), 50)
+        self.assertEqual(index.select(level="高"), ["r%d" % i for i in range(150, 200, 2)])
+        items, cursor = index.page(limit=5)
+        self.assertEqual([x["id"] for x in items], ["r199", "r198", "r197", "r196", "r195"])
+        index.add("r199", "2026-01-01T00199", "高", "f", {"id": "r199"})
+        self.assertEqual(len(index.select()), 50)
+
+
+class TestBulkDelete(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ReportStore(os.path.join(self.tmp.name, "reports.sqlite3"))
+        self.patches = [
+            mock.patch.dict(app_module.app.config, {"UPLOAD_FOLDER": self.tmp.name}),
+            mock.patch.object(app_module, "gemini_ready", lambda config=None: None),
+            mock.patch.object(app_module, "STORE", self.store),
+            mock.patch.object(app_module, "BODIES", BodyCache(self.store)),
+            mock.patch.object(app_module, "REPORTS", {}),
+            mock.patch.object(app_module, "HISTORY", HistoryLog()),
+            mock.patch.object(app_module, "DELETED_IDS", set()),
+            mock.patch.object(app_module, "DELETED_META", {}),
+            mock.patch.object(app_module, "REPORT_INDEX", TimeIndex()),
+            mock.patch.object(app_module, "HISTORY_INDEX", TimeIndex()),
+            mock.patch.object(app_module, "ALERT_INDEX", TimeIndex()),
+            mock.patch.object(app_module, "STATS", Aggregates()),
+        ]
+        for p in self.patches:
+            p.start()
+        self.client = app_module.app.test_client()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def _upload(self, level, n, tag):
+        data = {"files": [(io.BytesIO(b"%s %d" % (tag, i)), "%s%d.eml" % (tag.decode(), i)) for i in range(n)]}
+        with mock.patch.object(batch_module, "compute_risk", _risk(level)):
+            return self.client.post(
+                "/api/emails/upload?mode=batch", data=data, content_type="multipart/form-data"
+            ).get_json()["report_ids"]
+
+    def test_bulk_delete_by_level_and_ids_with_one_write_each(self):
+        low = self._upload("低", 4, b"low")
+        high = self._upload("高", 3, b"high")
+        writes = self.store.writes
+        r = self.client.post("/api/reports/bulk-delete", json={"level": "低"}).get_json()
+        self.assertEqual(sorted(r["ids"]), sorted(low))
+        self.assertEqual(self.store.writes, writes + 1)
+        r = self.client.post("/api/reports/bulk-delete", json={"ids": high[:2] + ["unknown"]}).get_json()
+        self.assertEqual(r["deleted"], 2)
+        self.assertEqual(self.store.writes, writes + 2)
+
+        self.assertEqual(len(app_module.HISTORY), 1)
+        self.assertEqual(self.client.get("/api/stats").get_json()["total"], 1)
+        self.assertEqual([x["id"] for x in self.client.get("/api/alerts").get_json()["items"]], [high[2]])
+        self.assertEqual(self.client.get("/api/reports/" + low[0]).status_code, 410)
+        reports, _, _, history, deleted = self.store.load()
+        self.assertEqual(list(reports), [high[2]])
+        self.assertEqual(len(deleted), 7)
+
+    def test_bulk_delete_by_age_and_validation(self):
+        ids = self._upload("高", 2, b"old")
+        r = self.client.post("/api/reports/bulk-delete", json={"older_than_days": 1}).get_json()
+        self.assertEqual(r["deleted"], 0)
+        r = self.client.post("/api/reports/bulk-delete", json={"before": "2999-01-01"}).get_json()
+        self.assertEqual(sorted(r["ids"]), sorted(ids))
+        self.assertEqual(self.client.post("/api/reports/bulk-delete", json={}).status_code, 400)
+        self.assertEqual(self.client.post("/api/reports/bulk-delete", json={"ids": "x"}).status_code, 400)
+
+    def test_deleting_a_pending_report_discards_its_result(self):
+        release = threading.Event()
+        fake = _risk("高")
+
+        def slow(parsed, model="gemini", **kwargs):
+            release.wait(5)
+            return fake(parsed, model)
+
+        with mock.patch.object(batch_module, "compute_risk", slow):
+            body = self.client.post(
+                "/api/emails/upload",
+                data={"files": [(io.BytesIO(b"pending mail"), "p.eml")]},
+                content_type="multipart/form-data",
+            ).get_json()
+            rid = body["report_ids"][0]
+            self.assertIn(rid, app_module.PENDING_IDS)
+            self.client.delete("/api/reports/" + rid)
+            release.set()
+            app_module.JOB_QUEUE.join()
+        self.assertNotIn(rid, app_module.REPORTS)
+        self.assertNotIn(rid, app_module.PENDING_IDS)
+        self.assertEqual(self.client.get("/api/reports/" + rid).status_code, 410)
+        self.assertEqual(self.client.get("/api/stats").get_json()["total"], 0)
+        self.assertEqual(self.client.get("/api/alerts").get_json()["items"], [])
+        self.assertEqual(self.client.get("/api/jobs/" + body["job_id"]).get_json()["status"], "done")
+        reports, _, _, history, deleted = self.store.load()
+        self.assertEqual((reports, history, list(deleted)), ({}, [], [rid]))
+
+    def test_delete_clears_indexes_without_summary_row(self):
+        rid = self._upload("高", 1, b"drift")[0]
+        # 摘要行缺失（如加载时被跳过）时，历史、索引与统计仍按 id 清理
+        app_module.REPORTS.pop(rid)
+        self.assertEqual(app_module._delete_reports([rid]), [])
+        self.assertEqual(len(app_module.HISTORY), 0)
+        self.assertEqual(len(app_module.HISTORY_INDEX), 0)
+        self.assertEqual(self.client.get("/api/stats").get_json()["total"], 0)
+        self.assertEqual(self.client.get("/api/alerts").get_json()["items"], [])
+
+    def test_tombstones_expire_after_retention(self):
+        ids = self._upload("低", 3, b"gone")
+        self.client.delete("/api/reports/" + ids[0])
+        self.client.post("/api/reports/bulk-delete", json={"ids": ids[1:]})
+        now = app_module.DELETED_META[ids[0]]["deleted_ts"]
+        self.assertEqual(app_module._compact_tombstones(now + 10), 0)
+        self.assertEqual(app_module._compact_tombstones(now + app_module.TOMBSTONE_RETENTION + 1), 3)
+        self.assertFalse(app_module.DELETED_IDS)
+        self.assertEqual(self.client.get("/api/reports/" + ids[0]).status_code, 404)
+        self.assertEqual(self.store.load()[4], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+import sys
+import os
+import time
+import concurrent.futures
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.detectors import ensemble
+
+LLM = {
+    "semantic_consistency": 50,
+    "style_anomaly": 40,
+    "social_engineering": 70,
+    "llm_generated_probability": 20,
+    "evidence": "x",
+}
+
+
+def _no_llm(text, model="gemini", config=None):
+    raise AssertionError("LLM should have been skipped")
+
+
+class TestCascade(unittest.TestCase):
+    def test_short_plain_note_skips_llm(self):
+        parsed = {"text": "hi team, lunch at noon", "urls": [], "attachments": [], "meta": {}}
+        with mock.patch.object(ensemble, "route_analyze", _no_llm):
+            risk = ensemble.compute_risk(parsed)
+        self.assertEqual(risk["cascade"]["decision"], "rules_benign")
+        self.assertEqual(risk["cascade"]["skipped"], ["llm"])
+        self.assertEqual(risk["level"], "低")
+
+    def test_executable_with_keywords_skips_llm(self):
+        parsed = {
+            "text": "urgent: verify your password, click here",
+            "urls": [],
+            "attachments": ["invoice.exe"],
+            "meta": {},
+        }
+        with mock.patch.object(ensemble, "route_analyze", _no_llm):
+            risk = ensemble.compute_risk(parsed)
+        self.assertEqual(risk["cascade"]["decision"], "rules_malicious")
+        # 判定变化：未调用 LLM 时基础公式只有规则部分，得分按规则下限计并注明，等级为高而非危急
+        self.assertLess(risk["cascade"]["partial_score"], ensemble.CASCADE_FLOOR)
+        self.assertEqual(risk["cascade"]["score_floor"], int(ensemble.CASCADE_FLOOR))
+        self.assertEqual(risk["score"], int(ensemble.CASCADE_FLOOR))
+        self.assertEqual(risk["level"], "高")
+        self.assertIn("得分按规则下限", risk["summary"])
+
+    def test_floor_is_configurable(self):
+        parsed = {"text": "urgent: verify your password, click here", "urls": [], "attachments": ["invoice.exe"], "meta": {}}
+        with mock.patch.object(ensemble, "route_analyze", _no_llm), mock.patch.object(ensemble, "CASCADE_FLOOR", 40):
+            risk = ensemble.compute_risk(parsed)
+        self.assertEqual((risk["score"], risk["level"]), (40, "中"))
+
+    def test_high_partial_score_keeps_baseline_formula(self):
+        parsed = {"text": "x", "urls": [], "attachments": [], "meta": {}}
+        rules = {"keyword": 100, "url": 100, "attachment": 100}
+        stats = {"perplexity": 50.0, "burstiness": 50.0}
+        with mock.patch.object(ensemble, "route_analyze", _no_llm):
+            risk = ensemble.compute_risk(parsed, rules=rules, stats=stats)
+        self.assertEqual(risk["cascade"]["decision"], "rules_malicious")
+        self.assertIsNone(risk["cascade"]["score_floor"])
+        self.assertEqual(risk["score"], int(ensemble.rule_score(rules, stats)))
+        self.assertNotIn("得分按规则下限", risk["summary"])
+
+    def test_uncertain_band_calls_llm(self):
+        parsed = {"text": "please verify the report", "urls": [], "attachments": ["a.docm"], "meta": {}}
+        with mock.patch.object(ensemble, "route_analyze", lambda text, model, config=None: dict(LLM)):
+            risk = ensemble.compute_risk(parsed)
+        self.assertIsNone(risk["cascade"]["decision"])
+        self.assertEqual(risk["features"]["llm"]["social_engineering"], 70)
+
+    def test_open_breaker_degrades_to_rules_only(self):
+        parsed = {"text": "please verify the report", "urls": [], "attachments": ["a.docm"], "meta": {}}
+
+        def breaker_open(text, model, config=None):
+            raise ensemble.BreakerOpen("open")
+
+        with mock.patch.object(ensemble, "route_analyze", breaker_open):
+            risk = ensemble.compute_risk(parsed)
+        self.assertIsNone(risk["cascade"]["decision"])
+        self.assertEqual(risk["cascade"]["skipped"], ["llm"])
+        self.assertEqual(risk["features"]["llm"], {})
+        self.assertEqual(risk["score"], int(risk["cascade"]["partial_score"]))
+        self.assertIn("熔断", risk["summary"])
+
+
+class TestDomains(unittest.TestCase):
+    def test_every_registered_domain_is_analysed_within_budget(self):
+        urls = [
+            "http://login.paypa1.com/a",
+            "https://www.paypa1.com/b",
+            "http://micros0ft-support.net/x",
+            "http://slow.example.org/",
+        ]
+        parsed = {"text": "PayPal: verify now", "urls": urls, "attachments": [], "meta": {}}
+        started = []
+
+        def fake_start(domain):
+            started.append(domain)
+            fut = concurrent.futures.Future()
+            if domain != "slow.example.org":
+                fut.set_result({"ok": True, "registrar": "r-" + domain, "entries": []})
+            return {"whois": fut}
+
+        with mock.patch.object(ensemble, "route_analyze", lambda text, model, config=None: dict(LLM)), \
+                mock.patch.object(ensemble, "start_enrichment", fake_start), \
+                mock.patch.object(ensemble, "DOMAIN_BUDGET", 0.05):
+            risk = ensemble.compute_risk(parsed)
+        self.assertEqual(started, ["login.paypa1.com", "micros0ft-support.net", "slow.example.org"])
+        rows = risk["features"]["domains"]
+        self.assertEqual([row["registered"] for row in rows], ["paypa1.com", "micros0ft-support.net", "example.org"])
+        self.assertEqual(rows[0]["brand"], "PayPal")
+        self.assertEqual(rows[2]["timed_out"], ["whois"])
+        brand = [th for th in risk["threats"] if th["name"] == "品牌冒充"]
+        self.assertIn("可疑域名: login.paypa1.com", brand[0]["evidence"])
+
+    def test_budget_runs_concurrently_with_llm(self):
+        parsed = {"text": "PayPal: verify now", "urls": ["http://slow.example.org/"], "attachments": [], "meta": {}}
+
+        def slow_llm(text, model, config=None):
+            time.sleep(0.3)
+            return dict(LLM)
+
+        def fake_start(domain):
+            return {"whois": concurrent.futures.Future()}
+
+        with mock.patch.object(ensemble, "route_analyze", slow_llm), \
+                mock.patch.object(ensemble, "start_enrichment", fake_start), \
+                mock.patch.object(ensemble, "DOMAIN_BUDGET", 0.2):
+            t0 = time.monotonic()
+            risk = ensemble.compute_risk(parsed)
+            elapsed = time.monotonic() - t0
+        # 预算在 LLM 返回前已耗尽，不再额外等待情报查询
+        self.assertLess(elapsed, 0.45)
+        self.assertEqual(risk["features"]["domains"][0]["timed_out"], ["whois"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+import unittest
+import sys
+import os
+import io
+import tempfile
+import uuid
+import queue
+import threading
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend import app as app_module
+from backend.services.jobs import JobQueue
+from backend.services.report_store import ReportStore, BodyCache
+from backend.detectors import batch as batch_module
+
+
+def _fake_risk(parsed, model="gemini", **kwargs):
+    return {
+        "score": 42,
+        "confidence": 0.71,
+        "level": "中",
+        "features": {"rules": {"keyword": 10, "url": 0, "attachment": 0}, "text": {}, "llm": {}},
+        "summary": "ok",
+        "threats": [],
+        "chain": [],
+    }
+
+
+class TestJobQueue(unittest.TestCase):
+    def test_runs_tasks_and_reports_stats(self):
+        q = JobQueue(workers=3, maxsize=10)
+        seen = []
+        lock = threading.Lock()
+
+        def task(i):
+            with lock:
+                seen.append(i)
+
+        for i in range(8):
+            q.submit(task, i)
+        q.join()
+        self.assertEqual(sorted(seen), list(range(8)))
+        st = q.stats()
+        self.assertEqual(st["workers"], 3)
+        self.assertEqual(st["processed"], 8)
+        self.assertEqual(st["queue_depth"], 0)
+
+    def test_failed_task_is_counted(self):
+        q = JobQueue(workers=1, maxsize=2)
+
+        def boom():
+            raise ValueError("x")
+
+        q.submit(boom)
+        q.join()
+        self.assertEqual(q.stats()["failed"], 1)
+
+    def test_submit_many_is_all_or_nothing(self):
+        q = JobQueue(workers=1, maxsize=3)
+        release = threading.Event()
+        seen = []
+        q.submit(release.wait)
+        # 等待工作线程取走阻塞任务，之后队列剩余容量为 3
+        while q.stats()["busy"] == 0:
+            release.wait(0.01)
+        q.submit_many([(seen.append, (1,)), (seen.append, (2,))])
+        with self.assertRaises(queue.Full):
+            q.submit_many([(seen.append, (3,)), (seen.append, (4,))])
+        self.assertEqual(q.stats()["queue_depth"], 2)
+        release.set()
+        q.join()
+        self.assertEqual(seen, [1, 2])
+
+
+class TestAsyncUpload(unittest.TestCase):
+    def setUp(self):
+        self.client = app_module.app.test_client()
+        self.tmp = tempfile.TemporaryDirectory()
+        store = ReportStore(os.path.join(self.tmp.name, "reports.sqlite3"))
+        self.patches = [
+            mock.patch.dict(app_module.app.config, {"UPLOAD_FOLDER": self.tmp.name}),
+            mock.patch.object(batch_module, "compute_risk", _fake_risk),
+            mock.patch.object(app_module, "gemini_ready", lambda config=None: None),
+            mock.patch.object(app_module, "STORE", store),
+            mock.patch.object(app_module, "BODIES", BodyCache(store, capacity=2)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_upload_returns_job_and_completes(self):
+        data = {
+            "files": [
+                (io.BytesIO(b"hello one"), "a.txt"),
+                (io.BytesIO(b"hello two"), "b.txt"),
+            ]
+        }
+        r = self.client.post("/api/emails/upload", data=data, content_type="multipart/form-data")
+        self.assertEqual(r.status_code, 202)
+        body = r.get_json()
+        self.assertEqual(len(body["report_ids"]), 2)
+        app_module.JOB_QUEUE.join()
+        job = self.client.get("/api/jobs/" + body["job_id"]).get_json()
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["done"], 2)
+        for rid in body["report_ids"]:
+            rep = self.client.get("/api/reports/" + rid)
+            self.assertEqual(rep.status_code, 200)
+            self.assertEqual(rep.get_json()["risk"], 42)
+        q = self.client.get("/api/engine/queue").get_json()
+        self.assertIn("queue_depth", q)
+        self.assertIn("utilisation", q)
+
+    def test_upload_rolls_back_when_queue_fills_up(self):
+        # 通过了入口处的容量检查，但入队时队列已被其他请求占满
+        body = ("queue full " + uuid.uuid4().hex).encode()
+        data = {"files": [(io.BytesIO(body), "a.txt"), (io.BytesIO(body + b"2"), "b.txt")]}
+        with mock.patch.object(app_module.JOB_QUEUE, "submit_many", side_effect=queue.Full):
+            r = self.client.post("/api/emails/upload", data=data, content_type="multipart/form-data")
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r.get_json()["error"], "queue_full")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        self.assertFalse(app_module.PENDING_IDS)
+        # 重新上传不会被去重到未入队的报告上
+        retry = self.client.post(
+            "/api/emails/upload", data={"files": [(io.BytesIO(body), "a.txt")]}, content_type="multipart/form-data"
+        ).get_json()
+        app_module.JOB_QUEUE.join()
+        job = self.client.get("/api/jobs/" + retry["job_id"]).get_json()
+        self.assertEqual((job["status"], job["deduplicated"]), ("done", 0))
+        self.assertEqual(self.client.get("/api/reports/" + retry["report_ids"][0]).status_code, 200)
+
+    def test_reports_keep_summary_rows_and_load_bodies_on_demand(self):
+        data = {"files": [(io.BytesIO(b"body %d" % i), "s%d.txt" % i) for i in range(4)]}
+        body = self.client.post(
+            "/api/emails/upload?mode=batch", data=data, content_type="multipart/form-data"
+        ).get_json()
+        for rid in body["report_ids"]:
+            self.assertEqual(set(app_module.REPORTS[rid]), {"id", "filename", "risk", "level", "ts"})
+        # 正文缓存容量为 2，较早的报告需要从存储读取
+        first = self.client.get("/api/reports/" + body["report_ids"][0]).get_json()
+        self.assertEqual(first["filename"], "s0.txt")
+        self.assertIn("features", first)
+
+    def test_batch_mode_keeps_upload_order(self):
+        data = {"files": [(io.BytesIO(b"mail %d" % i), "m%d.txt" % i) for i in range(5)]}
+        r = self.client.post(
+            "/api/emails/upload?mode=batch&concurrency=3",
+            data=data,
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(r.status_code, 200)
+        body = r.get_json()
+        self.assertEqual(body["status"], "done")
+        names = [app_module.REPORTS[rid]["filename"] for rid in body["report_ids"]]
+        self.assertEqual(names, ["m%d.txt" % i for i in range(5)])
+
+    def test_duplicate_upload_reuses_report(self):
+        calls = []
+
+        def counting_risk(parsed, model="gemini", **kwargs):
+            calls.append(kwargs.get("llm"))
+            out = _fake_risk(parsed, model)
+            out["features"]["llm"] = kwargs.get("llm") or {"style_anomaly": 7}
+            return out
+
+        body = ("urgent verify " + uuid.uuid4().hex).encode()
+        with mock.patch.object(batch_module, "compute_risk", counting_risk):
+            first = self.client.post(
+                "/api/emails/upload?mode=batch",
+                data={"files": [(io.BytesIO(body), "a.txt")]},
+                content_type="multipart/form-data",
+            ).get_json()
+            second = self.client.post(
+                "/api/emails/upload?mode=batch",
+                data={"files": [(io.BytesIO(body), "b.txt")]},
+                content_type="multipart/form-data",
+            ).get_json()
+            # 仅空白不同：原始摘要不同，归一化摘要相同，复用 LLM 特征
+            third = self.client.post(
+                "/api/emails/upload?mode=batch",
+                data={"files": [(io.BytesIO(body + b"\n\n"), "c.txt")]},
+                content_type="multipart/form-data",
+            ).get_json()
+        self.assertEqual(first["report_ids"], second["report_ids"])
+        # 整批都是重复文件时任务直接完成，不会停在 processing
+        job = self.client.get("/api/jobs/" + second["job_id"]).get_json()
+        self.assertEqual((job["status"], job["deduplicated"]), ("done", 1))
+        self.assertNotEqual(first["report_ids"], third["report_ids"])
+        self.assertEqual(calls, [None, {"style_anomaly": 7}])
+
+    def test_digest_is_not_returned_or_exported(self):
+        with mock.patch.object(batch_module, "compute_risk", _fake_risk):
+            rid = self.client.post(
+                "/api/emails/upload?mode=batch",
+                data={"files": [(io.BytesIO(uuid.uuid4().hex.encode()), "d.txt")]},
+                content_type="multipart/form-data",
+            ).get_json()["report_ids"][0]
+        report = self.client.get("/api/reports/" + rid).get_json()
+        self.assertEqual(report["id"], rid)
+        self.assertNotIn("digest", report)
+        exported = self.client.get("/api/v1/report/export?id=%s&format=json" % rid).get_json(force=True)
+        self.assertNotIn("digest", exported)
+        # 内部去重仍能取到摘要
+        self.assertIn("raw", app_module.STORE.digests([rid])[rid])
+
+
+if __name__ == '__main__':
+    unittest.main()
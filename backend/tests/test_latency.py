@@ -0,0 +1,41 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import latency
+from backend import app as app_module
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_and_window(self):
+        h = latency.Histogram(window=10, slots=5)
+        for ms in range(1, 101):
+            h.record(ms * 10, now=100.0)
+        snap = h.snapshot(now=100.0)
+        self.assertEqual(snap["count"], 100)
+        self.assertTrue(400 <= snap["p50"] <= 600)
+        self.assertTrue(900 <= snap["p95"] <= 1000)
+        self.assertTrue(snap["p95"] <= snap["p99"] <= 1000)
+        # 超出窗口的时间片不再计入
+        h.record(3, now=107.0)
+        self.assertEqual(h.snapshot(now=107.0)["count"], 101)
+        self.assertEqual(h.snapshot(now=111.0)["count"], 1)
+
+    def test_endpoint_reports_stages_and_providers(self):
+        reg = latency.LatencyRegistry()
+        reg.record("pipeline", 0.12)
+        reg.record("llm", 0.8, provider="gemini")
+        with mock.patch.object(app_module, "LATENCY", reg):
+            data = app_module.app.test_client().get("/api/engine/latency").get_json()
+        self.assertIsInstance(data["latency"], int)
+        self.assertGreater(data["latency"], 0)
+        self.assertIn("p99", data["stages"]["pipeline"])
+        self.assertEqual(data["providers"]["gemini"]["llm"]["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import json
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import llm_batch, metrics
+
+
+def _item(i, score):
+    return {
+        "id": i,
+        "semantic_consistency": score,
+        "style_anomaly": score,
+        "social_engineering": score,
+        "llm_generated_probability": score,
+        "evidence": "e%d" % i,
+    }
+
+
+class TestLLMBatch(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(llm_batch, "cache_lookup", lambda *a: (None, None)),
+            mock.patch.object(llm_batch, "cache_store", lambda *a: None),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_pack_respects_budget_and_item_cap(self):
+        groups = llm_batch.pack(["x" * 400] * 10, budget=llm_batch.estimate_tokens(llm_batch.BATCH_PROMPT) + 350, max_items=20)
+        self.assertTrue(all(len(g) <= 3 for g in groups))
+        self.assertEqual(sum(len(g) for g in groups), 10)
+        self.assertEqual([len(g) for g in llm_batch.pack(["a"] * 5, max_items=2)], [2, 2, 1])
+
+    def test_missing_items_are_left_for_single_analysis(self):
+        requests = []
+
+        def complete(system, user):
+            requests.append(user)
+            # 模型漏掉编号 1，并在数组后附带多余文本
+            return "结果如下：" + json.dumps([_item(0, 10), _item(2, 30)]) + " 完毕"
+
+        out = llm_batch.run_batch(
+            ["a", "b", "c", "x" * 8000], "gemini", "m", "v1", lambda t: t, complete, 5
+        )
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(out[0]["social_engineering"], 10)
+        # 缺失项与超长邮件留空，由单封流程经路由并发处理
+        self.assertIsNone(out[1])
+        self.assertEqual(out[2]["evidence"], "e2")
+        self.assertIsNone(out[3])
+
+    def test_calls_counted_per_packed_email(self):
+        before = metrics.LLM_CALLS.values().get(("t-ok",), 0)
+        llm_batch.run_batch(
+            ["a", "b", "c"], "gemini", "m", "v1", lambda t: t, lambda s, u: "[]", 5, name="t-ok"
+        )
+        self.assertEqual(metrics.LLM_CALLS.values()[("t-ok",)] - before, 3)
+
+    def test_all_requests_failing_raises(self):
+        def complete(system, user):
+            raise RuntimeError("503")
+
+        with self.assertRaises(RuntimeError):
+            llm_batch.run_batch(["a", "b"], "gemini", "m", "v1", lambda t: t, complete, 5, name="t-fail")
+        self.assertEqual(metrics.LLM_FAILURES.values()[("t-fail",)], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.llm_cache import VerdictCache, make_key
+
+VERDICT = {
+    "semantic_consistency": 10,
+    "style_anomaly": 20,
+    "social_engineering": 30,
+    "llm_generated_probability": 40,
+    "evidence": "测试",
+}
+
+
+class TestVerdictCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_provider_model_and_prompt(self):
+        base = make_key("gemini", "m1", "v1", "text")
+        self.assertNotEqual(base, make_key("glm", "m1", "v1", "text"))
+        self.assertNotEqual(base, make_key("gemini", "m2", "v1", "text"))
+        self.assertNotEqual(base, make_key("gemini", "m1", "v2", "text"))
+        self.assertEqual(base, make_key("gemini", "m1", "v1", "text"))
+
+    def test_memory_then_disk_hit(self):
+        key = make_key("gemini", "m1", "v1", "hello")
+        cache = VerdictCache(self.path, ttl=60, capacity=4)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, VERDICT)
+        self.assertEqual(cache.get(key), VERDICT)
+        self.assertEqual(cache.stats()["memory_hits"], 1)
+
+        fresh = VerdictCache(self.path, ttl=60, capacity=4)
+        self.assertEqual(fresh.get(key), VERDICT)
+        self.assertEqual(fresh.stats()["disk_hits"], 1)
+
+    def test_lru_capacity_and_ttl(self):
+        cache = VerdictCache(self.path, ttl=60, capacity=2)
+        for i in range(3):
+            cache.put("k%d" % i, VERDICT)
+        self.assertEqual(cache.stats()["memory_entries"], 2)
+
+        expired = VerdictCache(self.path, ttl=0, capacity=2)
+        self.assertIsNone(expired.get("k0"))
+
+
+if __name__ == '__main__':
+    unittest.main()
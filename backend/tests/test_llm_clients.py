@@ -0,0 +1,102 @@
+import unittest
+import sys
+import os
+import http.client
+from collections import deque
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.llm_clients import KeepAlivePool, HTTPStatusError
+
+ORIGIN = ("http", "llm.local", 8080)
+BODY = b"data: {\"a\": 1}\r\ndata: [DONE]\r\n"
+
+
+class FakeResponse:
+    def __init__(self, status=200):
+        self.status = status
+        self.will_close = False
+
+    def read(self):
+        return BODY
+
+    def __iter__(self):
+        return iter(BODY.splitlines(keepends=True))
+
+
+class FakeConn:
+    def __init__(self, stale=False, status=200):
+        self.stale = stale
+        self.status = status
+        self.closed = False
+        self.sock = None
+        self.timeout = None
+        self.sent = []
+
+    def request(self, method, path, body=None, headers=None):
+        if self.stale:
+            raise http.client.RemoteDisconnected("closed by peer")
+        self.sent.append((method, path, headers))
+
+    def getresponse(self):
+        return FakeResponse(self.status)
+
+    def close(self):
+        self.closed = True
+
+
+class TestKeepAlivePool(unittest.TestCase):
+    def setUp(self):
+        self.pool = KeepAlivePool(size=2)
+        self.stale = FakeConn(stale=True)
+        self.pool._idle[ORIGIN] = deque([self.stale])
+        self.fresh = []
+
+        def connect(host, port, timeout=None):
+            conn = FakeConn()
+            self.fresh.append(conn)
+            return conn
+
+        self.patch = mock.patch("http.client.HTTPConnection", connect)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_request_retries_stale_connection(self):
+        text = self.pool.request("POST", "http://llm.local:8080/v1/chat?x=1", body=b"{}")
+        self.assertEqual(text, BODY.decode())
+        self.assertTrue(self.stale.closed)
+        self.assertEqual(self.fresh[0].sent[0][:2], ("POST", "/v1/chat?x=1"))
+        self.assertEqual(self.fresh[0].sent[0][2]["Connection"], "keep-alive")
+        self.assertEqual(list(self.pool._idle[ORIGIN]), [self.fresh[0]])
+
+    def test_stream_retries_stale_connection(self):
+        lines = list(self.pool.stream_lines("POST", "http://llm.local:8080/v1/chat", body=b"{}"))
+        self.assertEqual(lines, ['data: {"a": 1}', "data: [DONE]"])
+        self.assertTrue(self.stale.closed)
+        self.assertEqual(len(self.fresh), 1)
+        self.assertEqual(list(self.pool._idle[ORIGIN]), [self.fresh[0]])
+        stats = self.pool.stats()
+        self.assertEqual((stats["created"], stats["reused"]), (1, 1))
+
+    def test_fresh_connection_failure_is_not_retried(self):
+        self.pool._idle.clear()
+        with mock.patch("http.client.HTTPConnection", lambda *a, **k: FakeConn(stale=True)):
+            with self.assertRaises(http.client.RemoteDisconnected):
+                list(self.pool.stream_lines("GET", "http://llm.local:8080/"))
+
+    def test_error_status_closes_stream_connection(self):
+        self.pool._idle.clear()
+        conn = FakeConn(status=503)
+        with mock.patch("http.client.HTTPConnection", lambda *a, **k: conn):
+            with self.assertRaises(HTTPStatusError):
+                list(self.pool.stream_lines("GET", "http://llm.local:8080/"))
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.pool.stats()["idle"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
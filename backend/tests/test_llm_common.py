@@ -0,0 +1,71 @@
+import unittest
+import sys
+import os
+import json
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import llm_common
+from backend.services.provider_config import ProviderConfig
+
+DATA = {
+    "semantic_consistency": "70.5",
+    "style_anomaly": 150,
+    "social_engineering": None,
+    "llm_generated_probability": 5,
+    "evidence": "要求重置密码",
+}
+
+
+class TestAnalyzeText(unittest.TestCase):
+    def setUp(self):
+        self.stored = []
+        self.patches = [
+            mock.patch.object(llm_common, "cache_lookup", lambda *a: ("k", None)),
+            mock.patch.object(llm_common, "cache_store", lambda k, v: self.stored.append(v)),
+            mock.patch.object(llm_common.streaming, "ENABLED", False),
+            mock.patch.object(llm_common.time, "sleep", lambda s: None),
+        ]
+        for p in self.patches:
+            p.start()
+        self.config = ProviderConfig(provider="glm46", model="m", api_key="k")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_retries_then_normalises_result(self):
+        calls = []
+
+        def complete(config, system, user):
+            calls.append((system, user))
+            if len(calls) == 1:
+                return "not json"
+            return "好的：" + json.dumps(DATA, ensure_ascii=False)
+
+        out = llm_common.analyze_text(self.config, "<p>Reset your password</p>", complete, None, 5)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0], (llm_common.PROMPT, "Reset your password"))
+        self.assertEqual(
+            out,
+            {
+                "semantic_consistency": 70,
+                "style_anomaly": 100,
+                "social_engineering": 0,
+                "llm_generated_probability": 5,
+                "evidence": "要求重置密码",
+            },
+        )
+        self.assertEqual(self.stored, [out])
+
+    def test_gives_up_with_provider_label(self):
+        with self.assertRaises(RuntimeError) as ctx:
+            llm_common.analyze_text(self.config, "x", lambda *a: "", None, 5, label="GLM")
+        self.assertTrue(str(ctx.exception).startswith("GLM 调用失败"))
+        self.assertEqual(self.stored, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
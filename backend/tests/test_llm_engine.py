@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import time
+import threading
+import concurrent.futures
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import llm_engine
+
+
+class TestLLMEngine(unittest.TestCase):
+    def setUp(self):
+        # 单线程的引擎，便于构造排队与超时
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.patches = [
+            mock.patch.object(llm_engine, "_EXECUTOR", self.executor),
+            mock.patch.object(llm_engine, "_STATS", dict.fromkeys(llm_engine._STATS, 0)),
+        ]
+        for p in self.patches:
+            p.start()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.shutdown(wait=True)
+        for p in self.patches:
+            p.stop()
+
+    def _blocked(self):
+        self.release.wait(5)
+        return "late"
+
+    def test_run_returns_result(self):
+        self.assertEqual(llm_engine.run(lambda: 42, timeout=1), 42)
+        self.executor.shutdown(wait=True)
+        stats = llm_engine.stats()
+        self.assertEqual((stats["submitted"], stats["completed"], stats["inflight"]), (1, 1, 0))
+
+    def test_run_propagates_errors(self):
+        def boom():
+            raise ValueError("bad")
+
+        with self.assertRaises(ValueError):
+            llm_engine.run(boom, timeout=1)
+
+    def test_timeout_abandons_running_call_without_waiting(self):
+        t0 = time.monotonic()
+        with self.assertRaises(llm_engine.LLMTimeout):
+            llm_engine.run(self._blocked, timeout=0.05)
+        self.assertLess(time.monotonic() - t0, 1)
+        stats = llm_engine.stats()
+        self.assertEqual((stats["timeouts"], stats["abandoned"], stats["cancelled"]), (1, 1, 0))
+        self.assertEqual(stats["inflight"], 1)
+
+    def test_timeout_cancels_queued_call(self):
+        llm_engine.submit(self._blocked)
+        ran = []
+        with self.assertRaises(llm_engine.LLMTimeout):
+            llm_engine.run(lambda: ran.append(1), timeout=0.05)
+        self.release.set()
+        self.executor.shutdown(wait=True)
+        # 排队中的任务被取消，之后不会再执行
+        self.assertEqual(ran, [])
+        stats = llm_engine.stats()
+        self.assertEqual((stats["cancelled"], stats["abandoned"], stats["inflight"]), (1, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
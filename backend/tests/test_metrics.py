@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+import threading
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import metrics
+from backend import app as app_module
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_sums_across_threads(self):
+        reg = metrics.Registry()
+        c = reg.counter("t_total", "测试", ["kind"])
+
+        def work():
+            for _ in range(1000):
+                c.inc(kind="a")
+            c.inc(5, kind="b")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(c.values(), {("a",): 8000, ("b",): 40})
+        # 不同线程应落在不同分片上，而不是全部争用同一把锁
+        self.assertGreater(sum(1 for lock, shard in c._shards._shards if shard), 1)
+        text = reg.render()
+        self.assertIn("# TYPE t_total counter", text)
+        self.assertIn('t_total{kind="a"} 8000', text)
+
+    def test_histogram_exposition(self):
+        reg = metrics.Registry()
+        h = reg.histogram("t_seconds", "测试", buckets=(0.1, 1.0))
+        h.observe(0.05)
+        h.observe(0.5)
+        h.observe(3)
+        lines = reg.render().splitlines()
+        self.assertIn('t_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('t_seconds_bucket{le="1.0"} 2', lines)
+        self.assertIn('t_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("t_seconds_count 3", lines)
+        self.assertIn("t_seconds_sum 3.55", lines)
+
+    def test_endpoint(self):
+        resp = app_module.app.test_client().get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content_type.startswith("text/plain"))
+        body = resp.get_data(as_text=True)
+        self.assertIn("# TYPE phish_job_queue_depth gauge", body)
+        self.assertIn("# TYPE phish_storage_write_seconds histogram", body)
+        self.assertIn('phish_llm_inflight{provider="gemini"}', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
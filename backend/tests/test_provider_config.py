@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+import dataclasses
+from collections import OrderedDict
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.provider_config import ProviderConfig, resolve
+from backend.services import router, gemini_llm
+from backend.services.llm_clients import ClientPool
+
+
+class TestProviderConfig(unittest.TestCase):
+    def test_overrides_do_not_leak_between_requests(self):
+        env = {"CUSTOM_API_KEY": "env-key", "CUSTOM_BASE_URL": "https://a.example/", "CUSTOM_MODEL": ""}
+        with mock.patch.dict(os.environ, env):
+            base = ProviderConfig.from_env("custom")
+            tenant = base.with_overrides(model="m2", api_key="k2", base_url="https://b.example")
+            again = ProviderConfig.from_env("custom")
+        self.assertEqual(base, again)
+        self.assertEqual(base.model, "gpt-4o-mini")
+        self.assertEqual(tenant.api_key, "k2")
+        self.assertEqual(tenant.cache_model, "https://b.example|m2")
+        self.assertNotEqual(base.client_key, tenant.client_key)
+        self.assertNotIn("k2", repr(tenant))
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            tenant.model = "x"
+
+    def test_resolve_ignores_config_of_other_provider(self):
+        cfg = ProviderConfig("glm46", "glm-x", "k")
+        self.assertIs(resolve("glm46", cfg), cfg)
+        self.assertEqual(resolve("gemini", cfg).provider, "gemini")
+
+    def test_router_passes_config_only_to_its_provider(self):
+        seen = {}
+
+        def fake(name):
+            def analyze_text(text, config=None):
+                seen[name] = config
+                if name == "gemini":
+                    raise RuntimeError("down")
+                return {"evidence": ""}
+
+            return mock.Mock(analyze_text=analyze_text)
+
+        providers = {name: (fake(name), lambda config=None: None) for name in router.PROVIDERS}
+        # 只覆盖模型、沿用环境密钥时仍可降级到其他提供方
+        cfg = ProviderConfig.from_env("gemini").with_overrides(model="gemini-x")
+        with mock.patch.object(router, "PROVIDERS", providers), mock.patch.object(router, "STATES", OrderedDict()):
+            res = router.analyze("x", "gemini", cfg)
+        self.assertEqual(res["provider"], "glm46")
+        self.assertIs(seen["gemini"], cfg)
+        self.assertIsNone(seen["glm46"])
+
+    def test_gemini_ensure_ready_returns_pooled_client(self):
+        cfg = ProviderConfig("gemini", "gemini-x", "tenant-key")
+        client = object()
+        genai = mock.Mock()
+        genai.Client.return_value = client
+        with mock.patch.object(gemini_llm, "HAS_GENAI", True), \
+                mock.patch.object(gemini_llm, "genai", genai, create=True), \
+                mock.patch.object(gemini_llm, "CLIENTS", ClientPool()):
+            self.assertIs(gemini_llm.ensure_ready(cfg), client)
+            self.assertIs(gemini_llm.ensure_ready(cfg), client)
+        genai.Client.assert_called_once_with(api_key="tenant-key")
+
+    def test_client_pool_is_bounded(self):
+        pool = ClientPool(capacity=2)
+        made = []
+
+        def factory(name):
+            made.append(name)
+            return object()
+
+        a = pool.get(("custom", "k1", None), lambda: factory("k1"))
+        pool.get(("custom", "k2", None), lambda: factory("k2"))
+        self.assertIs(pool.get(("custom", "k1", None), lambda: factory("k1")), a)
+        pool.get(("custom", "k3", None), lambda: factory("k3"))
+        self.assertEqual(pool.stats(), {"custom": 2})
+        # k2 最久未用已被淘汰，再次获取时重新创建
+        pool.get(("custom", "k2", None), lambda: factory("k2"))
+        self.assertEqual(made, ["k1", "k2", "k3", "k2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+import time
+import threading
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import rate_limit
+from backend.services.llm_clients import HTTPStatusError
+from backend.services.llm_engine import LLMTimeout
+from backend.services.provider_config import ProviderConfig
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_throttle_detection(self):
+        self.assertTrue(rate_limit.is_throttle(HTTPStatusError(429)))
+        self.assertFalse(rate_limit.is_throttle(HTTPStatusError(500)))
+        self.assertTrue(rate_limit.is_throttle(LLMTimeout("x")))
+        sdk = RuntimeError("quota")
+        sdk.code, sdk.status = 429, "RESOURCE_EXHAUSTED"
+        self.assertTrue(rate_limit.is_throttle(sdk))
+        self.assertTrue(rate_limit.is_throttle(mock.Mock(spec=["response"], response=mock.Mock(status_code=429))))
+        # 正文里出现 429 的普通错误不是限流
+        self.assertFalse(rate_limit.is_throttle(RuntimeError("invoice 429 rejected: rate limit field invalid")))
+        self.assertFalse(rate_limit.is_throttle(ValueError("bad json")))
+
+    def test_aimd_halves_on_429_and_recovers(self):
+        lim = rate_limit.AdaptiveLimiter("t", rate=1000, concurrency=8)
+        with mock.patch.object(rate_limit, "THROTTLE_PAUSE", 0):
+            with self.assertRaises(HTTPStatusError):
+                lim.run(mock.Mock(side_effect=HTTPStatusError(429)), 5)
+            self.assertEqual(lim.stats()["concurrency_limit"], 4)
+            self.assertEqual(lim.stats()["throttled"], 1)
+            for _ in range(40):
+                lim.run(lambda: None, 5)
+        stats = lim.stats()
+        self.assertEqual(stats["concurrency_limit"], 8)
+        self.assertEqual(stats["inflight"], 0)
+        self.assertEqual(stats["succeeded"], 40)
+
+    def test_timed_out_call_keeps_slot_until_it_finishes(self):
+        lim = rate_limit.AdaptiveLimiter("t", rate=1000, concurrency=8)
+        release = threading.Event()
+        with self.assertRaises(LLMTimeout):
+            lim.run(lambda: release.wait(5), 0.05)
+        # 引擎放弃了等待，但调用仍在执行，名额不能提前归还
+        self.assertEqual(lim.stats()["inflight"], 1)
+        self.assertEqual(lim.stats()["decreases"], 1)
+        release.set()
+        for _ in range(100):
+            if lim.stats()["inflight"] == 0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(lim.stats()["inflight"], 0)
+        self.assertEqual(lim.stats()["succeeded"], 1)
+
+    def test_concurrent_429s_decrease_once(self):
+        lim = rate_limit.AdaptiveLimiter("t", rate=1000, concurrency=8)
+        for _ in range(3):
+            lim.acquire()
+        for _ in range(3):
+            lim.release(HTTPStatusError(429))
+        self.assertEqual(lim.stats()["concurrency_limit"], 4)
+        self.assertEqual(lim.stats()["throttled"], 3)
+        self.assertEqual(lim.stats()["decreases"], 1)
+
+    def test_limiters_are_per_credential(self):
+        env = ProviderConfig.from_env("custom")
+        tenant = env.with_overrides(api_key="tenant-secret", base_url="http://tenant.example")
+        with mock.patch.object(rate_limit, "LIMITERS", rate_limit.OrderedDict()):
+            self.assertIs(rate_limit.get("custom"), rate_limit.get("custom", env))
+            busy = rate_limit.get("custom", tenant)
+            self.assertIsNot(busy, rate_limit.get("custom"))
+            busy.acquire()
+            busy.release(HTTPStatusError(429))
+            # 租户密钥被限流不影响环境配置的配额
+            self.assertEqual(rate_limit.get("custom").stats()["decreases"], 0)
+            busy.acquire()
+            self.assertEqual(rate_limit.inflight()["custom"], 1)
+            stats = rate_limit.stats()
+            self.assertEqual(stats["tenant_credentials"], {"custom": 1})
+            self.assertNotIn("tenant-secret", str(stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
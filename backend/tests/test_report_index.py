@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.report_index import TimeIndex, decode_cursor
+from backend import app as app_module
+
+LEVELS = ["低", "中", "高", "危急"]
+
+
+def _fill(index, n=50):
+    # 故意乱序插入，验证索引始终按时间有序
+    for i in list(range(0, n, 2)) + list(range(1, n, 2)):
+        ts = "2026-01-%02dT00:00:00" % (i // 2 + 1)
+        rid = "r%03d" % i
+        index.add(rid, ts, LEVELS[i % 4], ("inv_" if i % 5 == 0 else "mail_") + rid, {"id": rid, "ts": ts, "level": LEVELS[i % 4]})
+
+
+def _walk(index, **kwargs):
+    out, cursor = [], None
+    while True:
+        items, cursor = index.page(cursor=decode_cursor(cursor) if cursor else None, **kwargs)
+        out.extend(items)
+        if not cursor:
+            return out
+
+
+class TestTimeIndex(unittest.TestCase):
+    def test_pages_cover_everything_in_order(self):
+        index = TimeIndex()
+        _fill(index)
+        items = _walk(index, limit=7)
+        self.assertEqual(len(items), 50)
+        keys = [(x["ts"], x["id"]) for x in items]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        asc = _walk(index, limit=9, descending=False)
+        self.assertEqual(asc, items[::-1])
+
+    def test_filters(self):
+        index = TimeIndex()
+        _fill(index)
+        high = _walk(index, limit=4, level="高")
+        self.assertEqual({x["level"] for x in high}, {"高"})
+        self.assertEqual(len(high), len([i for i in range(50) if i % 4 == 2]))
+        ranged = _walk(index, limit=5, since="2026-01-03", until="2026-01-05T00:00:00")
+        self.assertEqual({x["ts"][:10] for x in ranged}, {"2026-01-03", "2026-01-04", "2026-01-05"})
+        inv = _walk(index, limit=3, prefix="inv_")
+        self.assertEqual(sorted(x["id"] for x in inv), ["r%03d" % i for i in range(0, 50, 5)])
+
+    def test_remove_and_replace(self):
+        index = TimeIndex()
+        _fill(index, 4)
+        self.assertTrue(index.remove("r001"))
+        self.assertFalse(index.remove("r001"))
+        index.add("r000", "2027-01-01", "低", "x", {"id": "r000"})
+        items, cursor = index.page(limit=10)
+        self.assertEqual([x["id"] for x in items], ["r000", "r003", "r002"])
+        self.assertIsNone(cursor)
+
+
+class TestListEndpoints(unittest.TestCase):
+    def test_history_is_paginated(self):
+        index = TimeIndex()
+        _fill(index, 10)
+        client = app_module.app.test_client()
+        with mock.patch.object(app_module, "HISTORY_INDEX", index):
+            first = client.get("/api/history?limit=4&level=低&order=desc").get_json()
+            self.assertEqual([x["id"] for x in first["items"]], ["r008", "r004", "r000"])
+            self.assertIsNone(first["next_cursor"])
+            # 未指定 order 时保持旧版的追加顺序（由旧到新）
+            oldest = client.get("/api/history?limit=3").get_json()
+            self.assertEqual([x["id"] for x in oldest["items"]], ["r000", "r001", "r002"])
+            page = client.get("/api/history?limit=6").get_json()
+            rest = client.get("/api/history?limit=6&cursor=" + page["next_cursor"]).get_json()
+            self.assertEqual(len(page["items"]) + len(rest["items"]), 10)
+            self.assertFalse(page["items"][0]["deleted"])
+            self.assertEqual(client.get("/api/history?cursor=zzz").status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services.report_store import ReportStore, BodyCache
+
+
+def _report(rid, level="高"):
+    return {
+        "id": rid,
+        "filename": rid + ".eml",
+        "risk": 70,
+        "level": level,
+        "features": {"rules": {"keyword": 5, "url": 0, "attachment": 0}, "llm": {"style_anomaly": 9, "evidence": "..."}},
+        "threats": [],
+        "digest": {"raw": "r-" + rid, "normalized": "n-" + rid},
+    }
+
+
+def _summary(rid, level="高", ts="2026-01-01T00:00:00+00:00"):
+    return {"id": rid, "filename": rid + ".eml", "risk": 70, "level": level, "ts": ts}
+
+
+def _entry(rid):
+    return {"id": rid, "level": "高", "score": 70, "filename": rid + ".eml", "ts": "2026-01-01T00:00:00+00:00"}
+
+
+class TestReportStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "reports.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_delete_and_reload(self):
+        store = ReportStore(self.path)
+        store.append(_report("a"), _entry("a"))
+        store.append(_report("b"), _entry("b"))
+        store.append(_report("c", "错误"))
+        store.delete_many({"b": {"deleted_at": "x", "had_record": True}})
+        self.assertEqual(store.writes, 4)
+
+        store = ReportStore(self.path)
+        reports, digests, features, history, deleted = store.load()
+        self.assertEqual(reports, {"a": _summary("a"), "c": _summary("c", "错误", None)})
+        self.assertEqual(digests["a"], {"raw": "r-a", "normalized": "n-a"})
+        self.assertEqual(
+            features["a"],
+            {
+                "rules": {"keyword": 5, "url": 0, "attachment": 0},
+                "llm": {"style_anomaly": 9, "social_engineering": 0, "llm_generated_probability": 0},
+            },
+        )
+        self.assertEqual(store.get("a"), _report("a"))
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(history, [_entry("a")])
+        self.assertEqual(deleted, {"b": {"deleted_at": "x", "had_record": True}})
+
+    def test_migrates_storage_json_once(self):
+        legacy = os.path.join(self.tmp.name, "storage.json")
+        with open(legacy, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "reports": {"a": _report("a")},
+                    "history": [_entry("a")],
+                    "deleted_ids": ["z"],
+                    "deleted_meta": {"z": {"had_record": False}},
+                },
+                f,
+            )
+        store = ReportStore(self.path)
+        self.assertTrue(store.empty())
+        store.migrate(legacy)
+        self.assertFalse(os.path.exists(legacy))
+        self.assertTrue(os.path.exists(legacy + ".migrated"))
+        reports, _, _, history, deleted = store.load()
+        self.assertEqual(reports, {"a": _summary("a")})
+        self.assertEqual(store.get("a"), _report("a"))
+        self.assertEqual(history, [_entry("a")])
+        self.assertEqual(deleted, {"z": {"had_record": False}})
+        self.assertFalse(store.empty())
+
+    def test_body_cache_is_bounded(self):
+        store = ReportStore(self.path)
+        for rid in "abcd":
+            store.append(_report(rid), _entry(rid))
+        bodies = BodyCache(store, capacity=2)
+        for rid in "abcdab":
+            self.assertEqual(bodies.get(rid), _report(rid))
+        stats = bodies.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["misses"], 6)
+        self.assertEqual(bodies.get("b"), _report("b"))
+        self.assertEqual(bodies.stats()["hits"], 1)
+        self.assertIsNone(bodies.get("zz"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import sys
+import os
+import time
+from collections import OrderedDict
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import router, llm_cache
+from backend.services.provider_config import ProviderConfig
+
+OK = {"semantic_consistency": 1, "style_anomaly": 2, "social_engineering": 3, "llm_generated_probability": 4, "evidence": ""}
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            mock.patch.object(router, "STATES", OrderedDict()),
+            mock.patch.object(router, "PROVIDERS", {
+                "gemini": (mock.Mock(), lambda: None),
+                "glm46": (mock.Mock(), lambda: None),
+                "custom": (mock.Mock(), mock.Mock(side_effect=RuntimeError("未配置"))),
+            }),
+        ]
+        for p in self.patches:
+            p.start()
+        self.gemini = router.PROVIDERS["gemini"][0]
+        self.glm = router.PROVIDERS["glm46"][0]
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_falls_back_and_opens_breaker(self):
+        self.gemini.analyze_text.side_effect = RuntimeError("503")
+        self.glm.analyze_text.return_value = dict(OK)
+        for _ in range(router.CB_FAILURES):
+            res = router.analyze("x", "gemini")
+            self.assertEqual(res["provider"], "glm46")
+        self.assertEqual(router._state("gemini").state(), "open")
+        self.gemini.analyze_text.reset_mock()
+        router.analyze("x", "gemini")
+        self.gemini.analyze_text.assert_not_called()
+
+    def test_batch_failures_open_breaker_and_skip_provider(self):
+        self.gemini.analyze_batch.side_effect = RuntimeError("503")
+        for _ in range(router.CB_FAILURES):
+            self.assertEqual(router.analyze_batch(["a", "b"], "gemini"), [None, None])
+        self.assertEqual(router._state("gemini").state(), "open")
+        self.gemini.analyze_batch.reset_mock()
+        # 熔断中整批留空，不再发送打包请求
+        self.assertEqual(router.analyze_batch(["a", "b"], "gemini"), [None, None])
+        self.gemini.analyze_batch.assert_not_called()
+        self.glm.analyze_batch.assert_not_called()
+
+    def test_open_breaker_fails_fast_for_single_provider(self):
+        # 只配置了一个提供方（或请求自带凭据）时，熔断后不再调用它
+        router.PROVIDERS["glm46"] = (self.glm, mock.Mock(side_effect=RuntimeError("未配置")))
+        self.gemini.analyze_text.side_effect = RuntimeError("503")
+        for _ in range(router.CB_FAILURES):
+            with self.assertRaises(RuntimeError):
+                router.analyze("x", "gemini")
+        state = router._state("gemini")
+        self.assertEqual(state.state(), "open")
+        opened_at = state.opened_at
+        self.gemini.analyze_text.reset_mock()
+        for _ in range(3):
+            with self.assertRaises(router.BreakerOpen):
+                router.analyze("x", "gemini")
+        self.gemini.analyze_text.assert_not_called()
+        self.glm.analyze_text.assert_not_called()
+        # 未发出请求，熔断时间不被推后，冷却结束后可进入半开
+        self.assertEqual(state.opened_at, opened_at)
+
+    def test_slow_primary_is_hedged(self):
+        def slow(text, config=None):
+            time.sleep(0.5)
+            return dict(OK)
+
+        self.gemini.analyze_text.side_effect = slow
+        self.glm.analyze_text.return_value = dict(OK)
+        with mock.patch.object(router, "HEDGE_DELAY", 0.05):
+            res = router.analyze("x", "gemini")
+        self.assertEqual(res["provider"], "glm46")
+        self.assertEqual(router._state("glm46").hedge_wins, 1)
+
+    def test_cache_hits_do_not_lower_hedge_delay(self):
+        def cached(text, config=None):
+            llm_cache._HIT.set(True)
+            return dict(OK)
+
+        self.gemini.analyze_text.side_effect = cached
+        for _ in range(router.HEDGE_MIN_SAMPLES + 5):
+            router.analyze("x", "gemini")
+        state = router._state("gemini")
+        self.assertEqual(len(state.latencies), 0)
+        self.assertEqual(state.calls, 0)
+        self.assertEqual(state.hedge_delay(), router.HEDGE_DELAY)
+
+        self.gemini.analyze_text.side_effect = lambda text, config=None: dict(OK)
+        router.analyze("x", "gemini")
+        self.assertEqual(len(state.latencies), 1)
+
+    def test_tenant_credentials_have_their_own_breaker(self):
+        self.gemini.analyze_text.side_effect = RuntimeError("401")
+        self.glm.analyze_text.return_value = dict(OK)
+        tenant = ProviderConfig("gemini", "gemini-x", "tenant-key")
+        for _ in range(router.CB_FAILURES):
+            # 自带密钥的请求不降级到环境配置的其他提供方
+            with self.assertRaises(RuntimeError):
+                router.analyze("x", "gemini", tenant)
+        self.glm.analyze_text.assert_not_called()
+        self.assertEqual(router._state("gemini", tenant).state(), "open")
+        self.assertEqual(router._state("gemini").state(), "closed")
+        stats = router.stats()
+        self.assertEqual(stats["tenant_credentials"], {"gemini": 1})
+        self.assertNotIn("tenant-key", repr(stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
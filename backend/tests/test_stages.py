@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+import time
+import threading
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.detectors import stages
+
+
+class TestEnrichment(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.calls = []
+        self.calls_lock = threading.Lock()
+
+        def fake(kind):
+            def lookup(domain):
+                with self.calls_lock:
+                    self.calls.append((kind, domain))
+                self.release.wait(5)
+                return {"ok": True, "kind": kind, "entries": []}
+
+            return lookup
+
+        self.patches = [
+            mock.patch.object(stages, "LOOKUPS", {kind: fake(kind) for kind in ("whois", "ssl", "ct")}),
+            mock.patch.object(stages, "_INFLIGHT", {}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        self.release.set()
+        for p in self.patches:
+            p.stop()
+
+    def test_concurrent_duplicate_lookups_share_one_future(self):
+        results = []
+        start = threading.Barrier(8)
+
+        def worker():
+            start.wait()
+            results.append(stages.start_enrichment("paypa1.com"))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for kind in ("whois", "ssl", "ct"):
+            self.assertEqual(len({id(r[kind]) for r in results}), 1)
+        self.release.set()
+        out = stages.collect_enrichment(results[0])
+        self.assertEqual(out["timed_out"], [])
+        self.assertEqual(sorted(self.calls), [("ct", "paypa1.com"), ("ssl", "paypa1.com"), ("whois", "paypa1.com")])
+        # 完成后不再复用，下一次查询重新发起
+        for fut in results[0].values():
+            fut.result()
+        # 完成回调在 result() 返回后才从登记表中移除
+        for _ in range(100):
+            if not stages._INFLIGHT:
+                break
+            time.sleep(0.01)
+        stages.collect_enrichment(stages.start_enrichment("paypa1.com"))
+        self.assertEqual(len(self.calls), 6)
+
+    def test_deadline_marks_slow_lookups(self):
+        out = stages.collect_enrichment(stages.start_enrichment("slow.example"), deadline=0)
+        self.assertEqual(sorted(out["timed_out"]), ["ct", "ssl", "whois"])
+        self.assertEqual(out["whois"], {"ok": False})
+        self.assertEqual(stages.start_enrichment(""), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
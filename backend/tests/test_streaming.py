@@ -0,0 +1,60 @@
+import unittest
+import sys
+import os
+import json
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.services import streaming
+
+DATA = {
+    "semantic_consistency": 60,
+    "style_anomaly": 30,
+    "social_engineering": 80,
+    "llm_generated_probability": 10,
+    "evidence": "要求点击链接 {重置} \"密码\"",
+}
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for c in self.chunks:
+            self.read += 1
+            yield c
+
+    def close(self):
+        self.closed = True
+
+
+class TestIncrementalJSON(unittest.TestCase):
+    def test_stops_once_fields_arrive(self):
+        body = "好的，分析如下：\n```json\n" + json.dumps(DATA, ensure_ascii=False)
+        chunks = [body[i : i + 7] for i in range(0, len(body), 7)]
+        # 对象闭合前 evidence 已结束，后续解释文字不应再被读取
+        chunks[-1] = chunks[-1][:-1]
+        chunks += ["\n}\n```\n", "以下是详细推理过程……"] * 50
+        stream = FakeStream(chunks)
+        out = streaming.consume(stream, iter)
+        self.assertEqual(out, DATA)
+        self.assertTrue(stream.closed)
+        self.assertLess(stream.read, len(chunks) - 90)
+
+    def test_falls_back_to_whole_text(self):
+        parser = streaming.IncrementalJSON()
+        parser.feed('示例 {"a": 1} 结果 {"semantic_consistency": 1}')
+        self.assertFalse(parser.done)
+        self.assertEqual(parser.result(), {})
+
+    def test_budget_exceeded(self):
+        with self.assertRaises(streaming.LLMTimeout):
+            streaming.consume(FakeStream(["x"] * 3), iter, budget=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import sys
+import os
+import random
+from unittest import mock
+
+# Ensure backend can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.detectors import ensemble, vector
+
+DOMAIN_THREATS = {"品牌冒充", "域名同形异义"}
+SIGNED = {"Authentication-Results": "spf=pass dkim=pass", "DKIM-Signature": "v=1"}
+
+
+def _case(rnd):
+    rules = {k: rnd.choice([0, 10, 29, 30, 45, 60, 85, 100, rnd.randint(0, 100)]) for k in ("keyword", "url", "attachment")}
+    stats = {"perplexity": rnd.uniform(0, 100), "burstiness": rnd.uniform(0, 100)}
+    llm = {
+        k: rnd.choice([0, 30, 40, 59, 60, rnd.randint(0, 100)])
+        for k in ("semantic_consistency", "style_anomaly", "social_engineering", "llm_generated_probability")
+    }
+    parsed = {
+        "text": "hello",
+        "urls": [],
+        "attachments": ["a.docm"] if rnd.random() < 0.5 else [],
+        "meta": {"headers": SIGNED if rnd.random() < 0.5 else {}},
+    }
+    return parsed, rules, stats, llm
+
+
+class TestVectorScore(unittest.TestCase):
+    def test_matches_per_email_path(self):
+        rnd = random.Random(3)
+        reports, expected = [], []
+        for i in range(400):
+            parsed, rules, stats, llm = _case(rnd)
+            # 一半走级联（可能跳过 LLM），一半直接给定 LLM 特征
+            given = llm if i % 2 else None
+            with mock.patch.object(ensemble, "route_analyze", lambda text, model, config=None: dict(llm)):
+                risk = ensemble.compute_risk(parsed, rules=rules, stats=stats, llm=given)
+            reports.append({
+                "features": risk["features"],
+                "cascade": risk["cascade"],
+                "threats": risk["threats"],
+            })
+            expected.append({
+                "score": risk["score"],
+                "level": risk["level"],
+                "confidence": risk["confidence"],
+                "threats": [
+                    {"name": t["name"], "severity": t["severity"]}
+                    for t in risk["threats"]
+                    if t["name"] not in DOMAIN_THREATS
+                ],
+            })
+        self.assertEqual(vector.rescore(reports), expected)
+        decisions = {r["cascade"]["decision"] for r in reports}
+        self.assertLessEqual({None, "rules_malicious"}, decisions)
+
+    def test_empty_batch(self):
+        batch = vector.score_batch([])
+        self.assertEqual(len(batch["score"]), 0)
+        self.assertEqual(list(vector.results(batch)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
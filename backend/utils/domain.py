@@ -8,6 +8,34 @@ def extract_domain(url: str) -> str:
     m = re.match(r"https?://([^/]+)", url.strip(), re.IGNORECASE)
     return m.group(1).lower() if m else ""
 
+# 常见的二级公共后缀，注册域需再向左取一级
+MULTI_SUFFIXES = {
+    "com.cn", "net.cn", "org.cn", "gov.cn", "edu.cn", "ac.cn",
+    "com.hk", "com.tw", "com.sg", "com.au", "net.au", "org.au",
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "co.jp", "ne.jp", "or.jp",
+    "co.kr", "co.nz", "co.in", "com.br", "com.mx",
+}
+
+def registered_domain(host: str) -> str:
+    h = (host or "").split("@")[-1].split(":")[0].strip(".").lower()
+    if not h or "." not in h or re.fullmatch(r"[\d.]+", h):
+        return h
+    labels = h.split(".")
+    n = 3 if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_SUFFIXES else 2
+    return ".".join(labels[-n:])
+
+def unique_domains(urls, limit=None):
+    """按首次出现顺序返回各注册域对应的第一个主机名"""
+    seen = {}
+    for u in urls or []:
+        host = extract_domain(u)
+        key = registered_domain(host)
+        if key and key not in seen:
+            seen[key] = host
+            if limit and len(seen) >= limit:
+                break
+    return list(seen.values())
+
 CONF_MAP = {
     '0': 'o', '1': 'l', '3': 'e', '5': 's', '7': 't',
     '@': 'a', '$': 's', '!': 'i', '|': 'l', '€': 'e',
@@ -48,10 +76,11 @@ def _vec(s: str):
         vs[k] = vs[k] / norm
     return vs
 
-def embedding_similarity(a: str, b: str) -> float:
-    va = _vec(a or "")
-    vb = _vec(b or "")
+def cosine(va, vb) -> float:
     if not va or not vb:
         return 0.0
     keys = set(va.keys()) & set(vb.keys())
     return sum(va[k]*vb[k] for k in keys)
+
+def embedding_similarity(a: str, b: str) -> float:
+    return cosine(_vec(a or ""), _vec(b or ""))
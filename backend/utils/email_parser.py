@@ -48,7 +48,8 @@ def extract_text(msg):
 def extract_urls(text):
     if not text:
         return []
-    return list({m.group(0) for m in URL_REGEX.finditer(text)})
+    # 按首次出现顺序去重，保证"第一个链接"稳定
+    return list(dict.fromkeys(m.group(0) for m in URL_REGEX.finditer(text)))
 
 def extract_attachments(msg):
     items = []
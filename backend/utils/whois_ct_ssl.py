@@ -5,10 +5,12 @@ import socket
 import ssl
 import urllib.request
 import urllib.parse
+import threading
 import whois
 
 CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "whois_cache.json")
 TTL = 86400
+_CACHE_LOCK = threading.Lock()
 
 def _idna(domain):
     try:
@@ -25,18 +27,24 @@ def _load_cache():
 
 def _save_cache(data):
     os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
-    with open(CACHE_PATH, "w", encoding="utf-8") as f:
+    tmp = CACHE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, CACHE_PATH)
 
 def get_whois(domain):
+    return lookup_whois(domain)[0]
+
+def lookup_whois(domain):
+    """返回 (WHOIS 结果, 是否命中本地缓存)"""
     d = (_idna(domain) or "").lower()
     if not d:
-        return {"ok": False}
+        return {"ok": False}, False
     cache = _load_cache()
     now = int(time.time())
     ent = cache.get(d)
     if ent and (now - ent.get("ts", 0) < TTL):
-        return ent.get("data", {"ok": False})
+        return ent.get("data", {"ok": False}), True
     try:
         w = whois.whois(d)
         data = {
@@ -51,9 +59,12 @@ def get_whois(domain):
         }
     except Exception:
         data = {"ok": False}
-    cache[d] = {"ts": now, "data": data}
-    _save_cache(cache)
-    return data
+    # 并发查询时重新读取后合并写入，避免互相覆盖
+    with _CACHE_LOCK:
+        cache = _load_cache()
+        cache[d] = {"ts": now, "data": data}
+        _save_cache(cache)
+    return data, False
 
 def get_ssl_cert(domain, port=443):
     d = _idna(domain)